@@ -0,0 +1,122 @@
+"""
+Compare MP3 extraction through MoviePy against the direct ffmpeg engine, and
+against remuxing the source's AAC audio to M4A without transcoding
+(the "passthrough" profile). MoviePy is no longer an API dependency; its
+engine is skipped unless it is installed separately.
+
+Each trial runs in a fresh interpreter so peak memory is measured per
+engine: RSS growth of the Python process during the extraction, and the
+peak RSS of the ffmpeg child processes it spawned.
+
+Usage:
+    python benchmarks/audio_extraction.py [--repeat N]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from corpus import generate_video
+
+INPUTS = {
+    "short": 10,
+    "medium": 60,
+    "long": 300,
+}
+
+
+def load_moviepy():
+    from moviepy.editor import VideoFileClip
+
+    def run(video_path, audio_path):
+        video = VideoFileClip(video_path)
+        video.audio.write_audiofile(audio_path, codec="mp3", bitrate="192k", verbose=False, logger=None)
+        video.close()
+
+    return run
+
+
+def load_ffmpeg():
+    from main import AUDIO_PROFILES, encode_audio
+
+    def run(video_path, audio_path):
+        asyncio.run(encode_audio(video_path, [(AUDIO_PROFILES["mp3-192k"]["args"], audio_path)]))
+
+    return run
+
+
+def load_passthrough():
+    from main import AUDIO_PROFILES, encode_audio
+
+    def run(video_path, audio_path):
+        settings = AUDIO_PROFILES["passthrough"]["copy"]["aac"]
+        m4a_path = os.path.splitext(audio_path)[0] + settings["suffix"]
+        asyncio.run(encode_audio(video_path, [(settings["args"], m4a_path)]))
+
+    return run
+
+
+ENGINES = {
+    "moviepy": load_moviepy,
+    "ffmpeg": load_ffmpeg,
+    "passthrough": load_passthrough,
+}
+
+
+def worker(engine, video_path):
+    """Run a single extraction and print wall time and peak memory as JSON"""
+    run = ENGINES[engine]()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as out_dir:
+        started = time.perf_counter()
+        run(video_path, os.path.join(out_dir, "out.mp3"))
+        wall = time.perf_counter() - started
+
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({
+        "wall_s": wall,
+        "python_rss_growth_mb": (self_rss - baseline_rss) / 1024,
+        "child_peak_rss_mb": child_rss / 1024
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", nargs=2, metavar=("ENGINE", "VIDEO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    print(f"{'input':<8} {'engine':<11} {'wall (s)':>10} {'python RSS growth (MB)':>23} {'ffmpeg peak RSS (MB)':>21}")
+    for label, duration in INPUTS.items():
+        video_path = generate_video(duration)
+        for engine in ENGINES:
+            if engine == "moviepy" and importlib.util.find_spec("moviepy") is None:
+                continue
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--worker", engine, str(video_path)],
+                    check=True,
+                    capture_output=True,
+                    text=True
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            wall = min(run["wall_s"] for run in runs)
+            growth = max(run["python_rss_growth_mb"] for run in runs)
+            child = max(run["child_peak_rss_mb"] for run in runs)
+            print(f"{label:<8} {engine:<11} {wall:>10.2f} {growth:>23.1f} {child:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
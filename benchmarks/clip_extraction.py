@@ -0,0 +1,67 @@
+"""
+Measure how /clip extraction latency scales with the number of clips.
+
+Compares one ffmpeg process per clip (the previous behaviour) against the
+single-pass extraction used by the API, on a lavfi-generated source.
+
+Usage:
+    python benchmarks/clip_extraction.py [--duration SECONDS] [--counts 1,5,10,25,50]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import generate_video
+from main import CLIP_BATCH_SIZE, extract_subclips
+
+
+async def per_clip(video_path, time_ranges, clip_paths):
+    for (start_time, end_time), clip_path in zip(time_ranges, clip_paths):
+        await extract_subclips(video_path, [(start_time, end_time)], [clip_path])
+
+
+async def single_pass(video_path, time_ranges, clip_paths):
+    for batch_start in range(0, len(clip_paths), CLIP_BATCH_SIZE):
+        batch_end = batch_start + CLIP_BATCH_SIZE
+        await extract_subclips(video_path, time_ranges[batch_start:batch_end], clip_paths[batch_start:batch_end])
+
+
+STRATEGIES = {
+    "per-clip": per_clip,
+    "single-pass": single_pass,
+}
+
+
+def spread_clips(duration, count, clip_length=5):
+    """Spread count clips of clip_length seconds evenly over the source"""
+    step = (duration - clip_length) / max(count, 1)
+    return [(i * step, i * step + clip_length) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=300)
+    parser.add_argument("--counts", default="1,5,10,25,50")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    video_path = str(generate_video(args.duration))
+    print(f"{'clips':>6} {'strategy':<12} {'latency (s)':>12} {'per clip (ms)':>14}")
+    for count in (int(value) for value in args.counts.split(",")):
+        time_ranges = spread_clips(args.duration, count)
+        for name, strategy in STRATEGIES.items():
+            timings = []
+            for _ in range(args.repeat):
+                with tempfile.TemporaryDirectory() as out_dir:
+                    clip_paths = [str(Path(out_dir) / f"clip_{i}.mp4") for i in range(count)]
+                    started = time.perf_counter()
+                    asyncio.run(strategy(video_path, time_ranges, clip_paths))
+                    timings.append(time.perf_counter() - started)
+            latency = min(timings)
+            print(f"{count:>6} {name:<12} {latency:>12.3f} {latency / count * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
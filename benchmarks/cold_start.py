@@ -0,0 +1,95 @@
+"""
+Measure cold start: how long a fresh process takes to import the app and to
+serve its first /health.
+
+Each trial starts a new interpreter with an empty TEMP_DIR. "import" times
+`import main` alone; "first /health" runs the app under uvicorn and times
+from process spawn until /health first answers 200, polling every 10 ms.
+--preload imports extra modules before the app, e.g. moviepy.editor to see
+what loading it at startup used to cost.
+
+Usage:
+    python benchmarks/cold_start.py [--repeat 5] [--port 8765] [--preload moviepy.editor]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from corpus import REPO_ROOT
+
+
+def preload_code(modules):
+    return "".join(f"import {module}; " for module in modules)
+
+
+def time_import(modules):
+    """Seconds to import the app in a fresh interpreter"""
+    code = f"import time; started = time.perf_counter(); {preload_code(modules)}import main; print(time.perf_counter() - started)"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ, TEMP_DIR=temp_dir, PYTHONPATH=str(REPO_ROOT))
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=temp_dir
+        ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_health(modules, port):
+    """Seconds from spawning a uvicorn process to its first successful /health"""
+    code = f"{preload_code(modules)}import uvicorn; uvicorn.run('main:app', port={port}, log_level='warning')"
+    url = f"http://127.0.0.1:{port}/health"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ, TEMP_DIR=temp_dir, PYTHONPATH=str(REPO_ROOT))
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-c", code],
+            env=env,
+            cwd=temp_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            while True:
+                try:
+                    if httpx.get(url, timeout=1).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving /health")
+                if time.perf_counter() - started > 60:
+                    raise RuntimeError("uvicorn did not serve /health within 60s")
+                time.sleep(0.01)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--preload", action="append", default=[], help="module to import before the app")
+    args = parser.parse_args()
+
+    measurements = {
+        "import": [time_import(args.preload) for _ in range(args.repeat)],
+        "first /health": [time_first_health(args.preload, args.port) for _ in range(args.repeat)],
+    }
+    print(f"{'measure':<14} {'min (s)':>8} {'median (s)':>11} {'max (s)':>8}")
+    for name, timings in measurements.items():
+        print(f"{name:<14} {min(timings):>8.3f} {statistics.median(timings):>11.3f} {max(timings):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
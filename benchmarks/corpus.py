@@ -0,0 +1,36 @@
+"""Synthetic media generation for benchmarks using ffmpeg's lavfi sources"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Make the application module importable when running `python benchmarks/<script>.py`
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+CORPUS_DIR = Path(os.getenv("BENCH_CORPUS_DIR", REPO_ROOT / "benchmarks" / ".corpus"))
+
+
+def generate_video(duration, size="640x360", rate=25, vcodec="libx264", gop=50, acodec="aac", name=None):
+    """Render a deterministic testsrc/sine video and return its path, reusing earlier renders"""
+    CORPUS_DIR.mkdir(parents=True, exist_ok=True)
+    name = name or f"testsrc_{size}_{duration}s_{vcodec}_g{gop}_{acodec}.mp4"
+    path = CORPUS_DIR / name
+    if path.exists():
+        return path
+
+    cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate={rate}:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+        "-c:v", vcodec, "-g", str(gop), "-pix_fmt", "yuv420p",
+    ]
+    if vcodec == "libx264":
+        cmd += ["-preset", "ultrafast"]
+    part_path = path.with_suffix(".part")
+    cmd += ["-c:a", acodec, "-shortest", "-f", "mp4", str(part_path)]
+    subprocess.run(cmd, check=True)
+    os.replace(part_path, path)
+    return path
@@ -0,0 +1,217 @@
+"""
+Find where the API saturates as concurrent clients ramp up.
+
+Starts the app under uvicorn on a local port, then runs closed-loop clients
+against it at each concurrency level: every client sends a request, waits for
+the full response and immediately sends the next. Requests are drawn from a
+mixed workload of /convert and /clip calls on small and large inputs with
+few and many clips. Refused requests are retried after their Retry-After.
+For each level the table shows successful requests per second and
+p50/p95/p99 latency, plus requests refused by admission control (503/507)
+and failures; the first level where adding clients no longer raises
+throughput by --knee-gain is reported as the knee.
+
+Server settings such as TRANSCODE_WORKERS or JOB_WORKERS are taken from the
+environment, so the same run can be repeated to see whether a change moves
+the knee.
+
+Usage:
+    python benchmarks/load_test.py [--levels 1,2,4,8,16] [--duration 30] [--output load.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from corpus import REPO_ROOT, generate_video
+
+SMALL = {"duration": 10, "size": "640x360"}
+LARGE = {"duration": 60, "size": "1280x720"}
+
+# (name, weight, endpoint, corpus input, number of clips)
+WORKLOAD = [
+    ("convert-small", 4, "/convert", SMALL, 0),
+    ("convert-large", 2, "/convert", LARGE, 0),
+    ("clip-small-2", 3, "/clip", SMALL, 2),
+    ("clip-large-10", 1, "/clip", LARGE, 10),
+]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def spread_clips(duration, count, clip_length=2):
+    """Spread count clips of clip_length seconds evenly over the source"""
+    step = (duration - clip_length) / count
+    return [{"start": round(i * step, 2), "end": round(i * step + clip_length, 2)} for i in range(count)]
+
+
+def build_requests():
+    """Load every workload input once and prepare its request body"""
+    requests = []
+    for name, weight, endpoint, spec, clips in WORKLOAD:
+        video_path = generate_video(**spec)
+        form = {"clips": json.dumps(spread_clips(spec["duration"], clips))} if clips else {}
+        requests.append({
+            "name": name,
+            "weight": weight,
+            "endpoint": endpoint,
+            "filename": video_path.name,
+            "video": video_path.read_bytes(),
+            "form": form
+        })
+    return requests
+
+
+@contextmanager
+def uvicorn_server(port):
+    """Run the app under uvicorn with a private TEMP_DIR and no result cache"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ, TEMP_DIR=temp_dir, CONVERT_CACHE_BYTES="0")
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--app-dir", str(REPO_ROOT),
+                "--port", str(port),
+                "--log-level", "warning"
+            ],
+            env=env,
+            cwd=temp_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.2)
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            server.terminate()
+            server.wait()
+
+
+async def run_level(base_url, requests, concurrency, duration, seed):
+    """Run concurrency closed-loop clients for duration seconds and collect (name, status, latency) results"""
+    results = []
+    weights = [request["weight"] for request in requests]
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def client_loop(client_id):
+            rng = random.Random(seed * 1000 + client_id)
+            while time.perf_counter() < deadline:
+                request = rng.choices(requests, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        request["endpoint"],
+                        files={"file": (request["filename"], request["video"], "video/mp4")},
+                        data=request["form"]
+                    )
+                    status = response.status_code
+                except httpx.HTTPError:
+                    response = None
+                    status = None
+                results.append((request["name"], status, time.perf_counter() - started))
+                # Back off from refused requests like a well-behaved client instead of spinning
+                if status in (503, 507):
+                    retry_after = float(response.headers.get("Retry-After", 1))
+                    await asyncio.sleep(max(0, min(retry_after, deadline - time.perf_counter())))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+    return results, wall
+
+
+def summarize(concurrency, results, wall):
+    latencies = [latency for _, status, latency in results if status == 200]
+    by_request = {}
+    for name, status, latency in results:
+        if status == 200:
+            by_request.setdefault(name, []).append(latency)
+    return {
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "refused": sum(1 for _, status, _ in results if status in (503, 507)),
+        "failed": sum(1 for _, status, _ in results if status not in (200, 503, 507)),
+        "throughput_rps": len(latencies) / wall,
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "latency_p99_by_request_s": {name: percentile(values, 0.99) for name, values in by_request.items()}
+    }
+
+
+def format_seconds(value):
+    return f"{value:.3f}" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--knee-gain", type=float, default=0.1, help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--output", help="write per-level results as JSON")
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.levels.split(",")]
+    requests = build_requests()
+    summaries = []
+    print(f"{'clients':>7} {'done':>6} {'refused':>7} {'failed':>6} {'req/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8}")
+    with uvicorn_server(args.port) as base_url:
+        for concurrency in levels:
+            results, wall = asyncio.run(run_level(base_url, requests, concurrency, args.duration, args.seed))
+            summary = summarize(concurrency, results, wall)
+            summaries.append(summary)
+            print(
+                f"{concurrency:>7} {summary['completed']:>6} {summary['refused']:>7} {summary['failed']:>6} "
+                f"{summary['throughput_rps']:>7.2f} {format_seconds(summary['latency_p50_s']):>8} "
+                f"{format_seconds(summary['latency_p95_s']):>8} {format_seconds(summary['latency_p99_s']):>8}"
+            )
+
+    knee = None
+    for previous, current in zip(summaries, summaries[1:]):
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 + args.knee_gain):
+            knee = previous["concurrency"]
+            break
+    if knee is None:
+        print(f"\nThroughput still rising at {levels[-1]} clients; no knee found")
+    else:
+        print(f"\nKnee at {knee} clients: more clients add less than {args.knee_gain:.0%} throughput")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            workload = [
+                {"name": name, "weight": weight, "endpoint": endpoint, "input": spec, "clips": clips}
+                for name, weight, endpoint, spec, clips in WORKLOAD
+            ]
+            json.dump({"workload": workload, "knee": knee, "levels": summaries}, output_file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
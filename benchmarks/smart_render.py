@@ -0,0 +1,64 @@
+"""
+Measure frame-accurate clip latency across clip lengths.
+
+Compares re-encoding the whole clip (the fallback) against the smart render
+used by the API, which re-encodes only the partial GOPs at either end of the
+clip and stream-copies the rest, on a lavfi-generated H.264 source.
+
+Usage:
+    python benchmarks/smart_render.py [--lengths 5,30,120] [--gop 50]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import generate_video
+from main import get_keyframes, probe_media, reencode_clip, render_accurate_clip
+
+
+async def full_reencode(video_path, start_time, end_time, clip_path, keyframes, video_stream):
+    await reencode_clip(video_path, start_time, end_time, clip_path)
+
+
+STRATEGIES = {
+    "full re-encode": full_reencode,
+    "smart render": render_accurate_clip,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", default="5,30,120")
+    parser.add_argument("--gop", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lengths = [float(value) for value in args.lengths.split(",")]
+    video_path = str(generate_video(int(max(lengths)) + 10, size="1280x720", gop=args.gop))
+    probe = asyncio.run(probe_media(video_path))
+    video_stream = next(stream for stream in probe["streams"] if stream["type"] == "video")
+    keyframes = asyncio.run(get_keyframes(video_path))
+
+    print(f"{'length (s)':>10} {'strategy':<15} {'latency (s)':>12} {'speedup':>8}")
+    for length in lengths:
+        # Start and end off keyframes so both edges need re-encoding
+        start_time = 1.3
+        end_time = start_time + length
+        baseline = None
+        for name, strategy in STRATEGIES.items():
+            timings = []
+            for _ in range(args.repeat):
+                with tempfile.TemporaryDirectory() as out_dir:
+                    clip_path = str(Path(out_dir) / "clip.mp4")
+                    started = time.perf_counter()
+                    asyncio.run(strategy(video_path, start_time, end_time, clip_path, keyframes, video_stream))
+                    timings.append(time.perf_counter() - started)
+            latency = min(timings)
+            baseline = baseline or latency
+            print(f"{length:>10.1f} {name:<15} {latency:>12.3f} {baseline / latency:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark /convert and /clip end to end against a synthetic corpus.
+
+Each scenario (an operation on one corpus input) runs in a fresh interpreter
+that starts the ASGI app in-process and drives it with httpx, so no server or
+network is involved. The corpus is rendered with lavfi testsrc/sine sources
+at varying resolution, duration, codec and GOP length. For every scenario the
+report records throughput, p50/p99 request latency, CPU seconds (the Python
+process plus its ffmpeg children) and peak RSS of both.
+
+With --baseline, the report is compared against an earlier one and the
+script exits non-zero if any metric regressed by more than --tolerance.
+
+Usage:
+    python benchmarks/suite.py [--output report.json] [--baseline baseline.json]
+                               [--requests 8] [--concurrency 2] [--only 360p]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from corpus import FFMPEG_BINARY, REPO_ROOT, generate_video
+
+CORPUS = {
+    "360p-10s-h264-g50": {"duration": 10, "size": "640x360"},
+    "720p-60s-h264-g50": {"duration": 60, "size": "1280x720"},
+    "1080p-30s-h264-g250": {"duration": 30, "size": "1920x1080", "gop": 250},
+    "720p-30s-mpeg4-g12": {"duration": 30, "size": "1280x720", "vcodec": "mpeg4", "gop": 12},
+}
+
+OPERATIONS = ("convert", "clip", "clip-accurate")
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {
+    "throughput_rps": True,
+    "latency_p50_s": False,
+    "latency_p99_s": False,
+    "cpu_s_per_request": False,
+    "python_peak_rss_mb": False,
+    "child_peak_rss_mb": False,
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def clip_form(duration, accurate):
+    """Five 2-second clips spread over the video, off keyframes when accurate"""
+    step = (duration - 3) / 5
+    offset = 0.3 if accurate else 0
+    clips = [
+        {"start": round(i * step + offset, 2), "end": round(i * step + offset + 2, 2), "accurate": accurate}
+        for i in range(5)
+    ]
+    return {"clips": json.dumps(clips)}
+
+
+def cpu_seconds():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime
+
+
+async def drive(operation, video_path, duration, requests, concurrency, warmup):
+    import httpx
+    from main import app
+
+    video = video_path.read_bytes()
+    if operation == "convert":
+        path, form = "/convert", {}
+    else:
+        path, form = "/clip", clip_form(duration, operation == "clip-accurate")
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            slots = asyncio.Semaphore(concurrency)
+            latencies = []
+
+            async def request(record=True):
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.post(path, files={"file": (video_path.name, video, "video/mp4")}, data=form)
+                    response.raise_for_status()
+                    if record:
+                        latencies.append(time.perf_counter() - started)
+
+            for _ in range(warmup):
+                await request(record=False)
+            cpu_started = cpu_seconds()
+            started = time.perf_counter()
+            await asyncio.gather(*(request() for _ in range(requests)))
+            wall = time.perf_counter() - started
+            cpu = cpu_seconds() - cpu_started
+    finally:
+        await app.router.shutdown()
+    return latencies, wall, cpu
+
+
+def worker(operation, input_name, requests, concurrency, warmup):
+    """Run one scenario and print its metrics as JSON"""
+    spec = CORPUS[input_name]
+    video_path = generate_video(**spec)
+    latencies, wall, cpu = asyncio.run(drive(operation, video_path, spec["duration"], requests, concurrency, warmup))
+    print(json.dumps({
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": requests / wall,
+        "input_mb_per_s": requests * video_path.stat().st_size / 1024 ** 2 / wall,
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "cpu_s_per_request": cpu / requests,
+        "python_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "child_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }))
+
+
+def run_scenario(operation, input_name, args):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # A private TEMP_DIR per run, and no result cache so repeats are not free
+        env = dict(os.environ, TEMP_DIR=temp_dir, CONVERT_CACHE_BYTES="0", PYTHONPATH=str(REPO_ROOT))
+        process = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__), "--worker", operation, input_name,
+                "--requests", str(args.requests),
+                "--concurrency", str(args.concurrency),
+                "--warmup", str(args.warmup)
+            ],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=temp_dir
+        )
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f"Scenario {operation}/{input_name} failed with exit code {process.returncode}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    ffmpeg_version = subprocess.run([FFMPEG_BINARY, "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT
+        ).stdout.strip() or None
+    except FileNotFoundError:
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Print how each scenario moved against the baseline and return the regressions"""
+    regressions = []
+    print(f"\n{'scenario':<34} {'metric':<19} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            print(f"{name:<34} (not in baseline)")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not previous.get(metric):
+                continue
+            change = current[metric] / previous[metric] - 1
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<34} {metric:<19} {previous[metric]:>10.3f} {current[metric]:>10.3f} {change:>+7.1%}{flag}")
+            if regressed:
+                regressions.append((name, metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression (default 0.15)")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", help="run only scenarios whose name contains this text")
+    parser.add_argument("--worker", nargs=2, metavar=("OPERATION", "INPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker, args.requests, args.concurrency, args.warmup)
+        return
+
+    report = {"environment": environment(), "scenarios": {}}
+    print(f"{'scenario':<34} {'req/s':>7} {'p50 (s)':>8} {'p99 (s)':>8} {'CPU s/req':>10} {'RSS (MB)':>9} {'ffmpeg RSS (MB)':>16}")
+    for input_name, spec in CORPUS.items():
+        generate_video(**spec)
+        for operation in OPERATIONS:
+            name = f"{operation}/{input_name}"
+            if args.only and args.only not in name:
+                continue
+            result = run_scenario(operation, input_name, args)
+            report["scenarios"][name] = result
+            print(
+                f"{name:<34} {result['throughput_rps']:>7.2f} {result['latency_p50_s']:>8.3f} "
+                f"{result['latency_p99_s']:>8.3f} {result['cpu_s_per_request']:>10.3f} "
+                f"{result['python_peak_rss_mb']:>9.1f} {result['child_peak_rss_mb']:>16.1f}"
+            )
+
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
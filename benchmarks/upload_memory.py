@@ -0,0 +1,135 @@
+"""
+Check that a multi-GB upload to /convert keeps memory flat regardless of its size.
+
+Starts the ASGI app in-process and sends it a generated multipart POST
+/convert of --size-gb through httpx, streaming the body chunk by chunk, so no
+server or network is involved. Peak RSS of this process is measured before
+and after the request. The body repeats one block, so the only memory it can
+cost is what request parsing and the upload save path hold. Exits with
+status 1 if the growth exceeds --ceiling-mb.
+
+The request declares the body's SHA-256, which the server verifies as it
+saves the upload. The content is not a video, so the request is expected to
+fail at the probe stage; reaching it (shown in Server-Timing) proves the full
+upload reached disk intact. Anything else also exits with status 1.
+
+Needs about twice --size-gb of free disk, since the multipart parser spools
+the file before it is copied into a work directory. Both copies are removed
+afterwards.
+
+Usage:
+    python benchmarks/upload_memory.py [--size-gb 3] [--ceiling-mb 64]
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import httpx
+
+from corpus import REPO_ROOT
+
+BLOCK_SIZE = 1024 * 1024
+BOUNDARY = "upload-memory-boundary"
+
+
+def generated_blocks(size):
+    """Yield size bytes of a repeated pattern in blocks of at most BLOCK_SIZE"""
+    block = bytes(range(256)) * (BLOCK_SIZE // 256)
+    remaining = size
+    while remaining:
+        chunk = block[:min(BLOCK_SIZE, remaining)]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def multipart_field(name, value):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+        f"{value}\r\n"
+    ).encode()
+
+
+async def multipart_body(size, sha256):
+    """Yield a multipart /convert request with a generated video file of size bytes"""
+    yield multipart_field("sha256", sha256)
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="generated.mp4"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode()
+    for chunk in generated_blocks(size):
+        yield chunk
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def upload(app, size, sha256):
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            return await client.post(
+                "/convert",
+                content=multipart_body(size, sha256),
+                headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+            )
+    finally:
+        await app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=3)
+    parser.add_argument("--ceiling-mb", type=float, default=64, help="allowed peak RSS growth")
+    args = parser.parse_args()
+
+    size = int(args.size_gb * 1024 ** 3)
+    digest = hashlib.sha256()
+    for chunk in generated_blocks(size):
+        digest.update(chunk)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # main reads TEMP_DIR at import time; the upload must fit the temp storage quota
+        os.environ["TEMP_DIR"] = temp_dir
+        os.environ.setdefault("TEMP_STORAGE_BYTES", str(2 * size))
+        from main import UPLOAD_CHUNK_SIZE, app
+
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        response = asyncio.run(upload(app, size, digest.hexdigest()))
+        elapsed = time.perf_counter() - started
+        growth = peak_rss_mb() - baseline
+        leftovers = [name for _, _, files in os.walk(temp_dir) for name in files]
+
+    server_timing = response.headers.get("Server-Timing", "")
+    print(f"app:               {REPO_ROOT / 'main.py'}")
+    print(f"upload size:       {size / 1024 ** 3:.2f} GiB")
+    print(f"chunk size:        {UPLOAD_CHUNK_SIZE} bytes")
+    print(f"throughput:        {size / 1024 ** 2 / elapsed:.0f} MiB/s")
+    print(f"response:          {response.status_code} {response.text[:100]}")
+    print(f"server timing:     {server_timing}")
+    print(f"peak RSS growth:   {growth:.1f} MiB (ceiling {args.ceiling_mb:.0f} MiB)")
+
+    if "probe;" not in server_timing:
+        print("FAIL: the upload was not saved intact, so the request never reached the probe")
+        sys.exit(1)
+    if leftovers:
+        print(f"FAIL: files left in TEMP_DIR: {leftovers}")
+        sys.exit(1)
+    if growth > args.ceiling_mb:
+        print("FAIL: uploading grew memory beyond the ceiling")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
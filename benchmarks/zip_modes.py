@@ -0,0 +1,57 @@
+"""
+Measure CPU seconds per GB archived by the streamed /clip ZIP.
+
+Compares DEFLATE for every entry (the previous behaviour) against the
+per-entry selection used by the API, which stores media as-is. The archive
+is built from a lavfi-generated MP4 repeated until the input reaches the
+requested size, and discarded as it streams.
+
+Usage:
+    python benchmarks/zip_modes.py [--size-mb 512]
+"""
+import argparse
+import asyncio
+import time
+import zipfile
+
+from corpus import generate_video
+from main import stream_zip, zip_compress_type
+
+MODES = {
+    "deflate-all": lambda arcname: zipfile.ZIP_DEFLATED,
+    "per-entry": zip_compress_type,
+}
+
+
+async def archive(video_path, copies, compress_type):
+    async def entries():
+        for i in range(copies):
+            yield f"clip_{i + 1}.mp4", video_path
+        yield "manifest.json", b'{"clips": []}'
+
+    archived = 0
+    async for data in stream_zip(entries(), compress_type):
+        archived += len(data)
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512)
+    args = parser.parse_args()
+
+    video_path = generate_video(120, size="1280x720")
+    video_size = video_path.stat().st_size
+    copies = max(1, args.size_mb * 1024 * 1024 // video_size)
+    input_gb = copies * video_size / 1024 ** 3
+
+    print(f"{'mode':<12} {'input (GB)':>10} {'output (GB)':>11} {'CPU (s)':>8} {'CPU s/GB':>9}")
+    for name, compress_type in MODES.items():
+        started = time.process_time()
+        archived = asyncio.run(archive(video_path, copies, compress_type))
+        cpu = time.process_time() - started
+        print(f"{name:<12} {input_gb:>10.2f} {archived / 1024 ** 3:>11.2f} {cpu:>8.2f} {cpu / input_gb:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
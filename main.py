@@ -1,16 +1,28 @@
 import os
+import asyncio
 import tempfile
 import zipfile
 import json
+import math
+import functools
+import time
+import hashlib
 import shutil
 import logging
-import subprocess
+import uuid
+import re
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
-from fastapi.responses import FileResponse
-from moviepy.editor import VideoFileClip
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
-import uvicorn
+from typing import Optional
+from urllib.parse import quote
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,10 +30,936 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Video to Audio Converter API", version="1.0.0")
 
-# Create temp directory if it doesn't exist
-TEMP_DIR = Path("temp")
+# Directory for all scratch files, cached results and stored assets; created if it doesn't exist
+TEMP_DIR = Path(os.getenv("TEMP_DIR", "temp"))
 TEMP_DIR.mkdir(exist_ok=True)
 
+# FFmpeg executables used for all media processing and metadata probing
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# Maximum number of media operations a worker runs at once; extra requests wait
+# for a free slot while the event loop keeps serving other traffic
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", os.cpu_count() or 1))
+transcode_slots = asyncio.Semaphore(TRANSCODE_WORKERS)
+
+# Maximum number of clips extracted by a single ffmpeg process
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", 32))
+
+# Maximum number of ffmpeg processes a single /clip request runs at once
+CLIP_CONCURRENCY = max(1, int(os.getenv("CLIP_CONCURRENCY", TRANSCODE_WORKERS)))
+
+# Size of the reads used to copy clips into a streamed ZIP archive
+ZIP_CHUNK_SIZE = int(os.getenv("ZIP_CHUNK_SIZE", 1024 * 1024))
+
+# ZIP entries with these suffixes are already compressed media and are stored as-is
+STORED_SUFFIXES = {".mp4", ".mov", ".mkv", ".webm", ".mp3", ".m4a", ".aac", ".opus", ".ogg", ".wav"}
+
+# Largest read from ffmpeg's stdout per chunk of a streamed /convert response
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 64 * 1024))
+
+# Uploads are copied to disk in chunks of this size so memory stays flat
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# Number of background workers running queued /jobs (and the synchronous endpoints)
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", TRANSCODE_WORKERS)))
+
+# Seconds a finished job and its result are kept for GET /jobs/{job_id}/result
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+
+# Admission control: media work running at once (jobs and streamed conversions),
+# work waiting for a worker or slot, and request body bytes being received at
+# once. Work beyond the first limit waits; requests beyond the others get 503
+# with a Retry-After estimate
+MAX_ACTIVE_JOBS = max(1, int(os.getenv("MAX_ACTIVE_JOBS", JOB_WORKERS)))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", 4 * JOB_WORKERS))
+MAX_UPLOAD_BYTES_IN_FLIGHT = int(os.getenv("MAX_UPLOAD_BYTES_IN_FLIGHT", 4 * 1024 * 1024 * 1024))
+
+# Number of ffprobe results kept in memory, keyed by upload content hash
+PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", 1024))
+
+# Encoder settings for the re-encoded parts of frame-accurate ("accurate") clips
+SMART_RENDER_PRESET = os.getenv("SMART_RENDER_PRESET", "veryfast")
+SMART_RENDER_CRF = os.getenv("SMART_RENDER_CRF", "18")
+
+# Source codecs whose partial GOPs can be re-encoded and joined with stream-copied GOPs
+SMART_RENDER_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+# Audio outputs /convert can produce, all encoded from a single decode of the source
+AUDIO_PROFILES = {
+    "mp3-192k": {
+        "suffix": ".mp3",
+        "media_type": "audio/mpeg",
+        "format": "mp3",
+        "args": ["-c:a", "libmp3lame", "-b:a", "192k"]
+    },
+    "opus-64k": {
+        "suffix": ".opus",
+        "media_type": "audio/ogg",
+        "format": "opus",
+        "args": ["-c:a", "libopus", "-b:a", "64k"]
+    },
+    "wav-16k-mono": {
+        "suffix": ".wav",
+        "media_type": "audio/wav",
+        "format": "wav",
+        "args": ["-c:a", "pcm_s16le", "-ar", "16000", "-ac", "1"]
+    },
+    # Remux the source audio without transcoding when a matching container
+    # exists for its codec, otherwise encode the fallback profile
+    "passthrough": {
+        "copy": {
+            "aac": {
+                "suffix": ".m4a",
+                "media_type": "audio/mp4",
+                "format": "ipod",
+                "args": ["-c:a", "copy"],
+                # MP4 needs a seekable output unless it is fragmented
+                "stream_args": ["-movflags", "empty_moov", "-frag_duration", "1000000"]
+            },
+            "mp3": {
+                "suffix": ".mp3",
+                "media_type": "audio/mpeg",
+                "format": "mp3",
+                "args": ["-c:a", "copy"]
+            },
+        },
+        "fallback": "mp3-192k"
+    },
+}
+DEFAULT_AUDIO_PROFILE = "mp3-192k"
+
+# Disk budget for cached /convert results (0 disables the cache)
+CONVERT_CACHE_BYTES = int(os.getenv("CONVERT_CACHE_BYTES", 1024 * 1024 * 1024))
+
+# Disk budget for stored source videos (POST /assets) and seconds an unused asset is kept
+ASSET_STORE_BYTES = int(os.getenv("ASSET_STORE_BYTES", 10 * 1024 * 1024 * 1024))
+ASSET_TTL = int(os.getenv("ASSET_TTL", 24 * 3600))
+
+# Seconds an unfinished resumable upload is kept after its last chunk
+UPLOAD_TTL = int(os.getenv("UPLOAD_TTL", 24 * 3600))
+UPLOAD_DIR = TEMP_DIR / "uploads"
+
+# Every job, streamed conversion and probe works in its own directory under here
+WORK_DIR = TEMP_DIR / "work"
+
+# Disk budget for work directories and resumable uploads together; new work
+# is refused with 507 beyond it, or while free disk space is below the minimum
+TEMP_STORAGE_BYTES = int(os.getenv("TEMP_STORAGE_BYTES", 20 * 1024 * 1024 * 1024))
+MIN_FREE_DISK_BYTES = int(os.getenv("MIN_FREE_DISK_BYTES", 1024 * 1024 * 1024))
+
+# Seconds between sweeps that re-measure temp storage and remove orphaned files
+TEMP_SWEEP_INTERVAL = int(os.getenv("TEMP_SWEEP_INTERVAL", 300))
+
+# Prometheus metrics served by GET /metrics. Stage latencies are labelled with
+# the top-level route that started the work and whether the stage succeeded
+STAGE_SECONDS = Histogram(
+    "video_api_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage", "endpoint", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+BYTES_RECEIVED = Counter("video_api_received_bytes", "Request body bytes received", ["endpoint"])
+BYTES_SENT = Counter("video_api_sent_bytes", "Response body bytes sent", ["endpoint"])
+ACTIVE_JOBS = Gauge("video_api_active_jobs", "Media operations running")
+QUEUED_JOBS = Gauge("video_api_queued_jobs", "Jobs waiting for a worker")
+TEMP_DIR_BYTES = Gauge("video_api_temp_dir_bytes", "Bytes held under TEMP_DIR", ["area"])
+FREE_DISK_BYTES = Gauge("video_api_free_disk_bytes", "Free space on the disk holding TEMP_DIR")
+metrics_endpoint = ContextVar("metrics_endpoint", default="background")
+# Seconds spent per stage by the current request or job, for Server-Timing and request logs
+stage_timings = ContextVar("stage_timings", default=None)
+
+
+class ResultCache:
+    """Content-addressed cache of conversion outputs on disk with LRU eviction"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # file name -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(content_hash, *params):
+        """Combine an upload hash and the output parameters into a cache key"""
+        return hashlib.sha256(":".join((content_hash,) + params).encode()).hexdigest()
+
+    def load(self):
+        """Index results left on disk by a previous run, oldest access first"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.entries.clear()
+        self.total_bytes = 0
+        # Partial files were being linked or copied in when a previous run stopped
+        files = sorted(
+            (
+                path for path in self.directory.iterdir()
+                if path.is_file() and not path.name.endswith(".partial")
+            ),
+            key=lambda path: path.stat().st_mtime
+        )
+        for path in files:
+            size = path.stat().st_size
+            self.entries[path.name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, key, suffix):
+        """Return the cached result for key, or None on a miss"""
+        name = key + suffix
+        path = self.directory / name
+        if name in self.entries and path.exists():
+            self.entries.move_to_end(name)
+            os.utime(path)
+            self.hits += 1
+            return path
+        if name in self.entries:
+            self.total_bytes -= self.entries.pop(name)
+        self.misses += 1
+        return None
+
+    def put(self, key, suffix, source_path):
+        """
+        Link a finished result into the cache and return the cached path, or None if it does not fit.
+        
+        The caller keeps source_path, so evicting the entry never removes a
+        file that a job or response still serves.
+        """
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return None
+        name = key + suffix
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial_path = self.directory / f"{name}.partial"
+        cleanup_files([str(partial_path)])
+        link_file(source_path, partial_path)
+        os.replace(partial_path, self.directory / name)
+        if name in self.entries:
+            self.total_bytes -= self.entries.pop(name)
+        self.entries[name] = size
+        self.total_bytes += size
+        self._evict()
+        return self.directory / name
+
+    def _evict(self):
+        """Remove least recently used results until the cache fits its budget"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            cleanup_files([str(self.directory / name)])
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+result_cache = ResultCache(TEMP_DIR / "cache", CONVERT_CACHE_BYTES)
+
+
+class Asset:
+    """A source video stored once and reused by later operations"""
+
+    def __init__(self, asset_id, path, filename, size, last_used_at=None):
+        self.id = asset_id
+        self.path = Path(path)
+        self.filename = filename
+        self.size = size
+        self.created_at = time.time()
+        self.last_used_at = last_used_at or self.created_at
+        self.refs = 0  # jobs currently using the asset; pinned assets are never removed
+
+    def to_dict(self):
+        return {
+            "asset_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "created_at": format_timestamp(self.created_at),
+            "last_used_at": format_timestamp(self.last_used_at),
+            "expires_at": format_timestamp(self.last_used_at + ASSET_TTL)
+        }
+
+
+class AssetStore:
+    """
+    Content-addressed store of uploaded source videos.
+    
+    Assets are identified by the SHA-256 of their content, expire ASSET_TTL
+    seconds after their last use and are evicted least recently used first
+    when the store is over its disk budget.
+    """
+
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.assets = OrderedDict()  # asset ID -> Asset, least recently used first
+        self.total_bytes = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def load(self):
+        """Index assets left on disk by a previous run, oldest use first"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.assets.clear()
+        self.total_bytes = 0
+        files = sorted(
+            (path for path in self.directory.iterdir() if path.is_file()),
+            key=lambda path: path.stat().st_mtime
+        )
+        for path in files:
+            stat = path.stat()
+            self.assets[path.stem] = Asset(path.stem, path, None, stat.st_size, stat.st_mtime)
+            self.total_bytes += stat.st_size
+        self.expire()
+
+    def put(self, temp_path, content_hash, filename, suffix):
+        """Move a saved upload into the store, or reuse the stored copy of the same content"""
+        asset = self.assets.get(content_hash)
+        if asset and asset.path.exists():
+            cleanup_files([temp_path])
+            self.touch(asset)
+            asset.filename = asset.filename or filename
+            return asset
+        
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            cleanup_files([temp_path])
+            raise HTTPException(
+                status_code=413,
+                detail=f"Video exceeds the asset storage limit of {self.max_bytes} bytes"
+            )
+        self._remove(content_hash)
+        self._evict(self.max_bytes - size)
+        if self.total_bytes + size > self.max_bytes:
+            cleanup_files([temp_path])
+            raise HTTPException(
+                status_code=507,
+                detail="Asset storage is full, try again once running jobs finish"
+            )
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{content_hash}{suffix}"
+        os.replace(temp_path, path)
+        asset = Asset(content_hash, path, filename, size)
+        self.assets[content_hash] = asset
+        self.total_bytes += size
+        return asset
+
+    def get(self, asset_id):
+        """Return a stored asset or raise 404"""
+        asset = self.assets.get(asset_id.lower())
+        if asset is None or not asset.path.exists():
+            raise HTTPException(
+                status_code=404,
+                detail=f"Asset {asset_id} not found"
+            )
+        return asset
+
+    def acquire(self, asset_id):
+        """Pin an asset for a job and refresh its expiry"""
+        asset = self.get(asset_id)
+        asset.refs += 1
+        self.touch(asset)
+        return asset
+
+    def release(self, asset_id):
+        """Unpin an asset once a job no longer needs it"""
+        asset = self.assets.get(asset_id)
+        if asset:
+            asset.refs = max(asset.refs - 1, 0)
+
+    def delete(self, asset_id):
+        """Remove an asset, refusing while jobs are using it"""
+        asset = self.get(asset_id)
+        if asset.refs:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Asset {asset_id} is in use by {asset.refs} job(s)"
+            )
+        self._remove(asset.id)
+
+    def expire(self):
+        """Remove unpinned assets not used within the TTL"""
+        deadline = time.time() - self.ttl
+        for asset in list(self.assets.values()):
+            if asset.refs == 0 and asset.last_used_at < deadline:
+                logger.info("🧹 Expiring asset %s", asset.id)
+                self._remove(asset.id)
+                self.expirations += 1
+
+    def touch(self, asset):
+        """Mark an asset as used now, postponing its expiry"""
+        asset.last_used_at = time.time()
+        self.assets.move_to_end(asset.id)
+        try:
+            os.utime(asset.path)
+        except OSError:
+            pass
+
+    def _remove(self, asset_id):
+        asset = self.assets.pop(asset_id, None)
+        if asset:
+            self.total_bytes -= asset.size
+            cleanup_files([str(asset.path)])
+
+    def _evict(self, max_bytes):
+        """Remove least recently used unpinned assets until at most max_bytes are stored"""
+        for asset in list(self.assets.values()):
+            if self.total_bytes <= max_bytes:
+                break
+            if asset.refs == 0:
+                self._remove(asset.id)
+                self.evictions += 1
+
+    def stats(self):
+        return {
+            "assets": len(self.assets),
+            "pinned": sum(1 for asset in self.assets.values() if asset.refs),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "expirations": self.expirations,
+            "evictions": self.evictions
+        }
+
+
+asset_store = AssetStore(TEMP_DIR / "assets", ASSET_STORE_BYTES, ASSET_TTL)
+
+
+class TempStorage:
+    """
+    Disk accounting for work directories and resumable uploads.
+    
+    Every scratch path is tracked with the bytes it holds, against a global
+    quota and a minimum of free disk space. Anything left behind by a crash
+    or a killed worker is removed by sweep: untracked paths in the managed
+    directories, files in indexed directories that their owner does not
+    index, and files directly under root, where earlier versions wrote their
+    scratch files.
+    """
+
+    FULL_DETAIL = "Not enough temporary disk space, try again later"
+
+    def __init__(self, root, directories, indexed, max_bytes, min_free_bytes):
+        self.root = Path(root)
+        self.directories = [Path(directory) for directory in directories]
+        # Directory -> the file names its owner indexes, e.g. the result cache's entries
+        self.indexed = {Path(directory): names for directory, names in indexed.items()}
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.entries = {}  # path -> bytes held
+        self.total_bytes = 0
+        self.refused = 0
+        self.orphans_removed = 0
+        self.orphan_bytes_removed = 0
+
+    def free_bytes(self):
+        return shutil.disk_usage(TEMP_DIR).free
+
+    def full(self, nbytes=0):
+        """Whether nbytes more would exceed the quota or leave too little free disk"""
+        return (
+            self.total_bytes + nbytes > self.max_bytes
+            or self.free_bytes() - nbytes < self.min_free_bytes
+        )
+
+    def check(self, nbytes=0):
+        """Refuse new work with 507 when nbytes more do not fit"""
+        if self.full(nbytes):
+            self.refused += 1
+            raise HTTPException(status_code=507, detail=self.FULL_DETAIL)
+
+    def track(self, path, nbytes=0):
+        self.entries[Path(path)] = nbytes
+        self.total_bytes += nbytes
+
+    def charge(self, path, nbytes):
+        """Account nbytes written under a tracked path, refusing writes beyond the quota"""
+        path = Path(path)
+        if path not in self.entries:
+            return
+        if self.total_bytes + nbytes > self.max_bytes:
+            self.refused += 1
+            raise HTTPException(status_code=507, detail=self.FULL_DETAIL)
+        self.entries[path] += nbytes
+        self.total_bytes += nbytes
+
+    def measure(self, path):
+        """Update a tracked path's size from what is actually on disk"""
+        path = Path(path)
+        if path not in self.entries:
+            return 0
+        size = disk_size(path)
+        self.total_bytes += size - self.entries[path]
+        self.entries[path] = size
+        return size
+
+    def usage(self, path):
+        return self.entries.get(Path(path), 0)
+
+    def release(self, path):
+        """Stop tracking a path and remove it from disk"""
+        self.total_bytes -= self.entries.pop(Path(path), 0)
+        cleanup_files([str(path)])
+
+    def sweep(self, min_age=0):
+        """
+        Re-measure tracked paths and remove untracked ones.
+        
+        Only orphans unmodified for min_age seconds are removed, so a sweep
+        never races a file that is still being created.
+        """
+        for path in list(self.entries):
+            self.measure(path)
+        deadline = time.time() - min_age
+        for path in self.orphan_candidates():
+            if path in self.entries:
+                continue
+            try:
+                if path.lstat().st_mtime > deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            size = disk_size(path)
+            logger.warning("🧹 Removing orphaned temp file %s (%s bytes)", path, size)
+            cleanup_files([str(path)])
+            self.orphans_removed += 1
+            self.orphan_bytes_removed += size
+
+    def orphan_candidates(self):
+        """List the paths sweep may remove, before tracked and recent ones are skipped"""
+        candidates = []
+        for directory in self.directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            candidates.extend(directory.iterdir())
+        for directory, names in self.indexed.items():
+            if directory.is_dir():
+                candidates.extend(path for path in directory.iterdir() if path.name not in names)
+        self.root.mkdir(parents=True, exist_ok=True)
+        candidates.extend(path for path in self.root.iterdir() if not path.is_dir())
+        return candidates
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "free_disk_bytes": self.free_bytes(),
+            "min_free_disk_bytes": self.min_free_bytes,
+            "full": self.full(),
+            "refused": self.refused,
+            "orphans_removed": self.orphans_removed,
+            "orphan_bytes_removed": self.orphan_bytes_removed
+        }
+
+
+temp_storage = TempStorage(
+    TEMP_DIR,
+    [WORK_DIR, UPLOAD_DIR],
+    {result_cache.directory: result_cache.entries},
+    TEMP_STORAGE_BYTES,
+    MIN_FREE_DISK_BYTES
+)
+
+
+class Upload:
+    """A resumable upload written chunk by chunk into a preallocated file"""
+
+    def __init__(self, length, filename, expected_sha256=None):
+        self.id = uuid.uuid4().hex
+        self.length = length
+        self.filename = filename
+        self.suffix = Path(filename).suffix if filename else ".mp4"
+        self.path = UPLOAD_DIR / f"{self.id}{self.suffix}"
+        self.expected_sha256 = expected_sha256
+        self.offset = 0
+        # Chunks only ever extend the received prefix, so the hash is kept incrementally
+        self.digest = hashlib.sha256()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.lock = asyncio.Lock()
+
+    def to_dict(self):
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "offset": self.offset,
+            "length": self.length,
+            "created_at": format_timestamp(self.created_at),
+            "expires_at": format_timestamp(self.updated_at + UPLOAD_TTL),
+            "upload_url": f"/uploads/{self.id}"
+        }
+
+
+# Prefix of the error reported when an operation fails unexpectedly
+JOB_ERROR_PREFIX = {
+    "convert": "Error converting video",
+    "clip": "Error clipping video",
+}
+
+
+class Job:
+    """A convert or clip operation queued for the background job workers"""
+
+    def __init__(
+        self,
+        operation,
+        work_dir,
+        source_path,
+        content_hash,
+        filename,
+        clips_data=None,
+        asset_id=None,
+        profiles=None
+    ):
+        self.id = uuid.uuid4().hex
+        self.work_dir = work_dir
+        self.endpoint = metrics_endpoint.get()
+        # Shared with the request that created the job, so its stages show in that request's timings
+        self.timings = stage_timings.get()
+        if self.timings is None:
+            self.timings = {}
+        self.operation = operation
+        self.source_path = source_path
+        self.content_hash = content_hash
+        self.asset_id = asset_id
+        self.clips_data = clips_data
+        self.profiles = profiles or [DEFAULT_AUDIO_PROFILE]
+        self.status = "queued"
+        self.status_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        
+        base_filename = Path(filename).stem if filename else None
+        # Client filenames only name downloads and archive entries; files on
+        # disk get fixed names inside the job's own work directory
+        self.base_filename = base_filename or "video"
+        self.audio_filename = base_filename or "output"
+        if operation == "convert":
+            self.result_filename = f"{self.audio_filename}_audio.zip"
+            self.resolve_audio_profiles()
+        else:
+            self.result_filename = f"{base_filename or 'video'}_clips.zip"
+        self.result_paths = {}  # audio profile -> output file of a convert job
+        self.encode_progress = 0.0
+        self.clip_paths = []
+        self.clip_filenames = []
+        self.clip_tasks = []
+        self.extraction_started = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def resolve_audio_profiles(self, audio_codec=None):
+        """Pick each profile's output settings for the source's audio codec and name the result"""
+        self.audio_settings = {name: resolve_audio_profile(name, audio_codec) for name in self.profiles}
+        if len(self.profiles) == 1:
+            self.result_filename = f"{self.audio_filename}{self.audio_settings[self.profiles[0]]['suffix']}"
+
+    @property
+    def progress(self):
+        if self.status == "succeeded":
+            return 1.0
+        if not self.clip_tasks:
+            return self.encode_progress
+        finished = sum(
+            1 for task in self.clip_tasks
+            if task.done() and not task.cancelled() and task.exception() is None
+        )
+        return finished / len(self.clip_tasks)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "created_at": format_timestamp(self.created_at),
+            "started_at": format_timestamp(self.started_at),
+            "finished_at": format_timestamp(self.finished_at),
+            "temp_bytes": temp_storage.usage(self.work_dir),
+            "result_url": f"/jobs/{self.id}/result" if self.status == "succeeded" else None
+        }
+
+
+class AdmissionController:
+    """
+    Global limits on media work and upload bytes, so overload is refused early.
+    
+    At most max_active operations (jobs and streamed conversions) run at once;
+    the rest wait for a slot, and new work is refused once max_queued are
+    waiting. Upload bytes are admitted while the request bodies being received
+    stay within max_upload_bytes; a single upload is always admitted when no
+    other is in flight, so large files are never refused outright.
+    """
+
+    def __init__(self, queue, max_active, max_queued, max_upload_bytes):
+        self.queue = queue
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_upload_bytes = max_upload_bytes
+        self.slots = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.waiting = 0  # operations taken off the queue that wait for a slot
+        self.upload_bytes = 0
+        self.rejected = 0
+        self.durations = deque(maxlen=50)  # seconds taken by recent operations
+
+    @property
+    def queued(self):
+        return self.queue.qsize() + self.waiting
+
+    def jobs_saturated(self):
+        return self.queued >= self.max_queued
+
+    def uploads_saturated(self, length=0):
+        return self.upload_bytes > 0 and self.upload_bytes + length > self.max_upload_bytes
+
+    def retry_after(self):
+        """Estimate the seconds until capacity frees up from recent operation durations"""
+        average = sum(self.durations) / len(self.durations) if self.durations else 5.0
+        waiting = self.queued + self.active - self.max_active + 1
+        return max(1, math.ceil(average * max(waiting, 1) / self.max_active))
+
+    def check_jobs(self):
+        """Raise 503 if no more media work can be admitted"""
+        if self.jobs_saturated():
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is at capacity, try again later",
+                headers={"Retry-After": str(self.retry_after())}
+            )
+
+    async def start(self):
+        """Wait for one of the max_active slots"""
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def finish(self, duration=None):
+        self.active -= 1
+        self.slots.release()
+        if duration is not None:
+            self.durations.append(duration)
+
+    def stats(self):
+        return {
+            "active_jobs": self.active,
+            "max_active_jobs": self.max_active,
+            "queued_jobs": self.queued,
+            "max_queued_jobs": self.max_queued,
+            "upload_bytes_in_flight": self.upload_bytes,
+            "max_upload_bytes_in_flight": self.max_upload_bytes,
+            "saturated": self.jobs_saturated() or self.upload_bytes >= self.max_upload_bytes,
+            "retry_after": self.retry_after(),
+            "rejected": self.rejected
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Refuse requests the server cannot take before their bodies are read.
+    
+    Requests that start media work are refused while the job limits are
+    reached, and any request body while the upload byte limit is reached.
+    New uploads are refused with 507 while temp storage is full.
+    Body bytes count as in flight until the body has been fully received.
+    """
+
+    WORK_ROUTES = {"/convert", "/clip", "/jobs"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope["headers"])
+        try:
+            length = int(headers.get(b"content-length", 0))
+        except ValueError:
+            length = 0
+        has_body = length > 0 or b"chunked" in headers.get(b"transfer-encoding", b"")
+        if scope["method"] == "POST" and scope["path"] in self.WORK_ROUTES and admission.jobs_saturated():
+            await self.reject(scope, receive, send)
+            return
+        if has_body and admission.uploads_saturated(length):
+            await self.reject(scope, receive, send)
+            return
+        if has_body and scope["method"] in ("POST", "PUT") and temp_storage.full(length):
+            temp_storage.refused += 1
+            response = JSONResponse(status_code=507, content={"detail": TempStorage.FULL_DETAIL})
+            await response(scope, receive, send)
+            return
+        if not has_body:
+            await self.app(scope, receive, send)
+            return
+        
+        # Reserve the declared length up front; chunked bodies are counted as they arrive
+        reserved = length
+        admission.upload_bytes += reserved
+        
+        async def counting_receive():
+            nonlocal reserved
+            message = await receive()
+            if message["type"] == "http.request":
+                if not length:
+                    reserved += len(message.get("body", b""))
+                    admission.upload_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    admission.upload_bytes -= reserved
+                    reserved = 0
+            elif message["type"] == "http.disconnect":
+                admission.upload_bytes -= reserved
+                reserved = 0
+            return message
+        
+        try:
+            await self.app(scope, counting_receive, send)
+        finally:
+            admission.upload_bytes -= reserved
+
+    async def reject(self, scope, receive, send):
+        admission.rejected += 1
+        response = JSONResponse(
+            status_code=503,
+            content={"detail": "Server is at capacity, try again later"},
+            headers={"Retry-After": str(admission.retry_after())}
+        )
+        await response(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Record upload receive and response send times, and bytes in and out, per endpoint.
+    
+    Upload time runs from the start of the request until its body has been
+    fully read; send time from the response headers to the last body chunk,
+    so it includes producing a streamed body. The endpoint label and a
+    per-request stage breakdown are made available to the processing stages
+    the request starts. Responses of TIMED_ROUTES carry the stages finished
+    before the headers in a Server-Timing header, and the full breakdown is
+    logged as one JSON line once the response is sent.
+    """
+
+    TIMED_ROUTES = {"/convert", "/clip"}
+
+    def __init__(self, app):
+        self.app = app
+        self.route_prefixes = None
+
+    def endpoint_label(self, scope):
+        """Label a request by its top-level route, e.g. /jobs for /jobs/{job_id}/result"""
+        if self.route_prefixes is None:
+            self.route_prefixes = {"/" + route.path.split("/")[1] for route in scope["app"].routes}
+        prefix = "/" + scope["path"].split("/")[1]
+        return prefix if prefix in self.route_prefixes else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        endpoint = self.endpoint_label(scope)
+        timed = endpoint in self.TIMED_ROUTES
+        received = BYTES_RECEIVED.labels(endpoint)
+        sent = BYTES_SENT.labels(endpoint)
+        started = time.perf_counter()
+        body_bytes = 0
+        sent_bytes = 0
+        upload_observed = False
+        send_started = None
+        status = 500
+        
+        async def timed_receive():
+            nonlocal body_bytes, upload_observed
+            message = await receive()
+            if message["type"] == "http.request":
+                body_bytes += len(message.get("body", b""))
+                received.inc(len(message.get("body", b"")))
+                if body_bytes and not message.get("more_body", False) and not upload_observed:
+                    upload_observed = True
+                    record_stage("upload", "ok", time.perf_counter() - started)
+            elif message["type"] == "http.disconnect" and body_bytes and not upload_observed:
+                upload_observed = True
+                record_stage("upload", "cancelled", time.perf_counter() - started)
+            return message
+        
+        async def timed_send(message):
+            nonlocal send_started, sent_bytes, status
+            if message["type"] == "http.response.start":
+                send_started = time.perf_counter()
+                status = message["status"]
+                if timed:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        server_timing(timings, send_started - started)
+                    )
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+                sent.inc(len(message.get("body", b"")))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record_stage("send", "ok" if status < 400 else "error", time.perf_counter() - send_started)
+                send_started = None
+        
+        timings = {}
+        endpoint_token = metrics_endpoint.set(endpoint)
+        timings_token = stage_timings.set(timings)
+        try:
+            await self.app(scope, timed_receive, timed_send)
+        finally:
+            if send_started is not None:
+                record_stage("send", "cancelled", time.perf_counter() - send_started)
+            stage_timings.reset(timings_token)
+            metrics_endpoint.reset(endpoint_token)
+            if timed:
+                logger.info("⏱️ %s", json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "bytes_in": body_bytes,
+                    "bytes_out": sent_bytes,
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+                }))
+
+
+probe_cache = OrderedDict()
+keyframe_cache = OrderedDict()
+jobs = {}
+uploads = {}
+job_queue = asyncio.Queue()
+background_workers = []
+# Filled in by probe_ffmpeg shortly after startup
+ffmpeg_capabilities = {"status": "probing"}
+admission = AdmissionController(job_queue, MAX_ACTIVE_JOBS, MAX_QUEUED_JOBS, MAX_UPLOAD_BYTES_IN_FLIGHT)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Gauges are read only when /metrics is scraped
+ACTIVE_JOBS.set_function(lambda: admission.active)
+QUEUED_JOBS.set_function(lambda: admission.queued)
+TEMP_DIR_BYTES.labels("work").set_function(lambda: temp_storage.total_bytes)
+TEMP_DIR_BYTES.labels("cache").set_function(lambda: result_cache.total_bytes)
+TEMP_DIR_BYTES.labels("assets").set_function(lambda: asset_store.total_bytes)
+FREE_DISK_BYTES.set_function(temp_storage.free_bytes)
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -37,127 +975,155 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"⚠️ Could not set temp directory permissions: {e}")
     
-    # Verify FFmpeg installation
-    try:
-        result = subprocess.run(
-            ['ffmpeg', '-version'], 
-            capture_output=True, 
-            text=True, 
-            timeout=5
-        )
-        if result.returncode == 0:
-            version_line = result.stdout.split('\n')[0]
-            logger.info(f"✅ FFmpeg is installed: {version_line}")
-        else:
-            logger.error("❌ FFmpeg check failed - return code non-zero")
-    except FileNotFoundError:
-        logger.error("❌ FFmpeg not found in PATH - video processing will fail!")
-    except subprocess.TimeoutExpired:
-        logger.error("❌ FFmpeg check timed out")
-    except Exception as e:
-        logger.error(f"❌ Error checking FFmpeg: {e}")
+    result_cache.load()
+    logger.info(
+        "🗄️ Result cache: %s entries, %s of %s bytes",
+        len(result_cache.entries),
+        result_cache.total_bytes,
+        result_cache.max_bytes
+    )
+    asset_store.load()
+    logger.info(
+        "📦 Asset store: %s assets, %s of %s bytes",
+        len(asset_store.assets),
+        asset_store.total_bytes,
+        asset_store.max_bytes
+    )
+    # Upload and job state lives in memory, so partial uploads and work
+    # directories from a previous run are all orphans, as are files earlier
+    # versions left directly under TEMP_DIR and unindexed cache files
+    temp_storage.sweep()
+    logger.info(
+        "🧹 Temp storage: removed %s orphans (%s bytes), %s bytes of disk free",
+        temp_storage.orphans_removed,
+        temp_storage.orphan_bytes_removed,
+        temp_storage.free_bytes()
+    )
+    
+    # Verify FFmpeg in the background so startup does not wait on a subprocess
+    background_workers.append(asyncio.create_task(probe_ffmpeg()))
+    
+    # Start the job workers and the reaper for expired job results
+    for _ in range(JOB_WORKERS):
+        background_workers.append(asyncio.create_task(job_worker()))
+    background_workers.append(asyncio.create_task(expire_jobs()))
+    background_workers.append(asyncio.create_task(expire_assets()))
+    background_workers.append(asyncio.create_task(expire_uploads()))
+    background_workers.append(asyncio.create_task(sweep_temp_storage()))
+    logger.info(f"👷 Started {JOB_WORKERS} job workers")
     
     port = os.getenv("PORT", "8000")
     logger.info(f"🌐 Server will start on port: {port}")
     logger.info("✅ API ready to accept requests")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    await cancel_tasks(background_workers)
+    background_workers.clear()
+
+
 @app.get("/")
 async def root():
     return {
         "message": "Video to Audio Converter API",
         "endpoints": {
-            "POST /convert": "Upload a video file and convert it to MP3",
+            "POST /convert": "Upload a video file and convert it to MP3 or other audio profiles",
             "POST /clip": "Upload a video file and clip it at specified start/end points",
-            "GET /health": "Check API health status"
+            "POST /jobs": "Queue a convert or clip job and return its ID immediately",
+            "GET /jobs/{job_id}": "Check a job's status and progress",
+            "GET /jobs/{job_id}/result": "Download the output of a finished job",
+            "POST /assets": "Upload a video once and get an asset ID to use instead of a file upload",
+            "GET /assets/{asset_id}": "Check a stored video's size and expiry",
+            "DELETE /assets/{asset_id}": "Remove a stored video",
+            "HEAD /blobs/{sha256}": "Check whether a video is already stored before uploading it",
+            "PUT /blobs/{sha256}": "Upload a video as the raw request body, verified against its SHA-256",
+            "POST /uploads": "Start a resumable upload of a large video",
+            "PATCH /uploads/{upload_id}": "Append a chunk at the Upload-Offset of a resumable upload",
+            "HEAD /uploads/{upload_id}": "Read the offset to resume a resumable upload from",
+            "POST /uploads/{upload_id}/finalize": "Turn a complete resumable upload into an asset",
+            "DELETE /uploads/{upload_id}": "Abort a resumable upload",
+            "POST /probe": "Upload a video file and read its duration, streams and codecs",
+            "GET /probe": "Look up metadata of a previously probed video by SHA-256",
+            "GET /health": "Check API health status",
+            "GET /metrics": "Prometheus metrics"
         }
     }
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    admission_stats = admission.stats()
+    temp_stats = temp_storage.stats()
+    return {
+        "status": "saturated" if admission_stats["saturated"] or temp_stats["full"] else "healthy",
+        "admission": admission_stats,
+        "temp_storage": temp_stats,
+        "ffmpeg": ffmpeg_capabilities,
+        "cache": result_cache.stats(),
+        "assets": asset_store.stats()
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose Prometheus metrics: per-stage latency histograms, byte counters and job and disk gauges"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.post("/convert")
-async def convert_video_to_audio(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def convert_video_to_audio(
+    background_tasks: BackgroundTasks,
+    file: Optional[UploadFile] = File(None),
+    asset_id: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None),
+    stream: bool = Form(False),
+    profiles: Optional[str] = Form(None)
+):
     """
     Convert uploaded video file to MP3 audio.
     
     Accepts various video formats (mp4, avi, mov, etc.) and returns MP3 audio file.
-    """
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith("video/"):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid file type. Please upload a video file."
-        )
-    
-    # Create temporary files
-    video_ext = Path(file.filename).suffix if file.filename else ".mp4"
-    temp_video_path = None
-    temp_audio_path = None
+    A video stored with POST /assets can be given by asset_id instead of a file,
+    and an upload is verified against sha256 when one is declared. With stream,
+    the MP3 is sent while it is being encoded instead of after.
     
-    try:
-        # Save uploaded video to temporary file
-        with tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=video_ext,
-            dir=TEMP_DIR
-        ) as temp_video:
-            content = await file.read()
-            temp_video.write(content)
-            temp_video_path = temp_video.name
-        
-        # Generate output audio filename
-        audio_filename = Path(file.filename).stem + ".mp3" if file.filename else "output.mp3"
-        temp_audio_path = TEMP_DIR / audio_filename
-        
-        # Convert video to audio using moviepy
-        video = VideoFileClip(temp_video_path)
-        video.audio.write_audiofile(
-            str(temp_audio_path),
-            codec='mp3',
-            bitrate='192k',
-            verbose=False,
-            logger=None
-        )
-        video.close()
-        
-        # Check if audio file was created
-        if not temp_audio_path.exists():
-            cleanup_files([temp_video_path])
+    profiles is a comma-separated list of AUDIO_PROFILES names (default
+    mp3-192k). Every profile is encoded from one decode of the source, and
+    several profiles are returned together as a ZIP bundle.
+    """
+    validate_video_source(file, asset_id)
+    audio_profiles = parse_profiles(profiles)
+    if stream:
+        if len(audio_profiles) > 1:
             raise HTTPException(
-                status_code=500,
-                detail="Failed to convert video to audio"
+                status_code=400,
+                detail="Streaming supports a single audio profile"
             )
-        
-        # Schedule cleanup after response is sent
-        background_tasks.add_task(cleanup_files, [temp_video_path, str(temp_audio_path)])
-        
-        # Return the audio file
-        return FileResponse(
-            path=str(temp_audio_path),
-            filename=audio_filename,
-            media_type="audio/mpeg"
-        )
+        return await stream_conversion(background_tasks, file, asset_id, sha256, audio_profiles[0])
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        # Cleanup on error
-        cleanup_files([temp_video_path, str(temp_audio_path) if temp_audio_path else None])
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error converting video: {str(e)}"
-        )
+    # Run the conversion as a job and wait for it
+    job = await create_job("convert", file, asset_id=asset_id, expected_sha256=sha256, profiles=audio_profiles)
+    await job.done.wait()
+    if job.status == "failed":
+        await discard_job(job)
+        raise HTTPException(status_code=job.status_code, detail=job.error)
+    
+    # Schedule cleanup after response is sent
+    background_tasks.add_task(discard_job, job)
+    
+    # Return the audio file, or the bundle of every profile
+    return audio_result_response(job)
 
 
 @app.post("/clip")
 async def clip_video(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    clips: str = Form(...)
+    file: Optional[UploadFile] = File(None),
+    clips: str = Form(...),
+    asset_id: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None)
 ):
     """
     Clip a video at multiple start/end points and return all clips as a ZIP file.
@@ -167,179 +1133,1721 @@ async def clip_video(
         clips: JSON string with array of clip definitions.
                Format: [{"start": 10, "end": 20}, {"start": 30, "end": 40}]
                Times are in seconds.
+        asset_id: ID of a video stored with POST /assets, instead of file
+        sha256: Declared SHA-256 of the uploaded file, verified as it is saved
     
     Returns:
         ZIP file containing all video clips
     """
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith("video/"):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid file type. Please upload a video file."
-        )
+    validate_video_source(file, asset_id)
+    clips_data = parse_clips(clips)
     
-    # Parse clips JSON
+    # Run the clipping as a job
+    job = await create_job("clip", file, clips_data, asset_id, sha256)
     try:
-        clips_data = json.loads(clips)
-        if not isinstance(clips_data, list):
-            raise ValueError("Clips must be a list")
-        
-        # Validate clip format
-        for i, clip in enumerate(clips_data):
-            if not isinstance(clip, dict):
-                raise ValueError(f"Clip {i} must be a dictionary")
-            if "start" not in clip or "end" not in clip:
-                raise ValueError(f"Clip {i} must have 'start' and 'end' keys")
-            if not isinstance(clip["start"], (int, float)) or not isinstance(clip["end"], (int, float)):
-                raise ValueError(f"Clip {i} start and end must be numbers")
-            if clip["start"] < 0 or clip["end"] < 0:
-                raise ValueError(f"Clip {i} start and end must be non-negative")
-            if clip["end"] <= clip["start"]:
-                raise ValueError(f"Clip {i} end must be greater than start")
-        
-        if len(clips_data) == 0:
-            raise ValueError("At least one clip must be specified")
-            
-    except json.JSONDecodeError as e:
+        # Wait for the first clip so early failures still get a proper error status
+        await job.extraction_started.wait()
+        if job.status == "failed":
+            raise HTTPException(status_code=job.status_code, detail=job.error)
+        first_clip = job.clip_tasks[0]
+        await asyncio.wait([first_clip])
+        # The worker cancels the remaining clips when any batch fails, so report the job's error
+        if first_clip.cancelled() or first_clip.exception() is not None:
+            await job.done.wait()
+            raise HTTPException(status_code=job.status_code, detail=job.error)
+    except BaseException:
+        await discard_job(job)
+        raise
+    
+    # Stream the ZIP, sending each clip as soon as it is ready; cancel any
+    # remaining work and clean up once the client is done or disconnects
+    background_tasks.add_task(discard_job, job)
+    return StreamingResponse(
+        stream_job_zip(job, discard=True),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(job.result_filename)}
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    operation: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    clips: Optional[str] = Form(None),
+    asset_id: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None),
+    profiles: Optional[str] = Form(None)
+):
+    """
+    Queue a convert or clip job and return its ID without waiting for it to run.
+    
+    Args:
+        operation: "convert" or "clip"
+        file: Video file to process
+        clips: JSON clip definitions, required for clip jobs (same format as /clip)
+        asset_id: ID of a video stored with POST /assets, instead of file
+        sha256: Declared SHA-256 of the uploaded file, verified as it is saved
+        profiles: Audio profiles for convert jobs (same format as /convert)
+    
+    Returns:
+        The job ID and the URLs to poll its status and fetch its result
+    """
+    if operation not in JOB_ERROR_PREFIX:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid JSON format for clips: {str(e)}"
+            detail="Invalid operation. Use 'convert' or 'clip'."
         )
-    except ValueError as e:
+    validate_video_source(file, asset_id)
+    clips_data = None
+    if operation == "clip":
+        if clips is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Clip jobs require a 'clips' field"
+            )
+        clips_data = parse_clips(clips)
+    audio_profiles = parse_profiles(profiles) if operation == "convert" else None
+    
+    job = await create_job(operation, file, clips_data, asset_id, sha256, audio_profiles)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report a job's state and progress"""
+    return find_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Download a finished job's output: the audio (or audio bundle) for convert jobs, the clips ZIP for clip jobs"""
+    job = find_job(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=job.status_code, detail=job.error)
+    if job.status != "succeeded":
         raise HTTPException(
-            status_code=400,
-            detail=str(e)
+            status_code=409,
+            detail=f"Job {job_id} is still {job.status}"
         )
     
-    # Create temporary files
+    if job.operation == "convert":
+        return audio_result_response(job)
+    return StreamingResponse(
+        stream_job_zip(job),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(job.result_filename)}
+    )
+
+
+@app.post("/assets", status_code=201)
+async def upload_asset(file: UploadFile = File(...), sha256: Optional[str] = Form(None)):
+    """
+    Store a video once so later /convert, /clip and /jobs requests can refer to it by ID.
+    
+    The asset ID is the SHA-256 of the video, so uploading the same video again
+    returns the existing asset. Assets expire ASSET_TTL seconds after their last use.
+    """
+    validate_video_upload(file)
     video_ext = Path(file.filename).suffix if file.filename else ".mp4"
-    temp_video_path = None
-    temp_zip_path = None
-    clip_paths = []
+    work_dir = make_work_dir("asset")
+    try:
+        temp_video_path, content_hash = await save_upload_file(file, video_ext, sha256, work_dir)
+        asset = asset_store.put(temp_video_path, content_hash, file.filename, video_ext)
+    finally:
+        remove_work_dir(work_dir)
+    logger.info("📦 Stored asset %s (%s bytes)", asset.id, asset.size)
+    return asset.to_dict()
+
+
+@app.get("/assets/{asset_id}")
+async def get_asset(asset_id: str):
+    """Report a stored video's size and expiry"""
+    return asset_store.get(asset_id).to_dict()
+
+
+@app.delete("/assets/{asset_id}", status_code=204)
+async def delete_asset(asset_id: str):
+    """Remove a stored video that no job is using"""
+    asset_store.delete(asset_id)
+
+
+@app.head("/blobs/{sha256}")
+async def head_blob(sha256: str):
+    """
+    Report whether a video with this SHA-256 is already stored.
+    
+    Clients check before uploading and, on 200, use the hash as an asset_id
+    without sending the video at all. The check postpones the asset's expiry.
+    """
+    asset = asset_store.get(parse_sha256(sha256))
+    asset_store.touch(asset)
+    return Response(headers={"Content-Length": str(asset.size), "ETag": f'"{asset.id}"'})
+
+
+@app.put("/blobs/{sha256}", status_code=201)
+async def put_blob(sha256: str, request: Request, response: Response, filename: Optional[str] = None):
+    """
+    Store a video sent as the raw request body under its declared SHA-256.
+    
+    The body is hashed while it streams to disk and rejected if it does not
+    match. Content the server already holds is not read again.
+    """
+    content_hash = parse_sha256(sha256)
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("video/"):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file type. Please upload a video file."
+        )
+    if content_hash in asset_store.assets:
+        asset = asset_store.get(content_hash)
+        asset_store.touch(asset)
+        response.status_code = 200
+        return asset.to_dict()
     
+    video_ext = Path(filename).suffix if filename else ".mp4"
+    work_dir = make_work_dir("blob")
     try:
-        # Save uploaded video to temporary file
-        with tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=video_ext,
-            dir=TEMP_DIR
-        ) as temp_video:
-            content = await file.read()
-            temp_video.write(content)
-            temp_video_path = temp_video.name
-        
-        # Load video to get metadata
-        video = VideoFileClip(temp_video_path)
-        video_duration = video.duration
-        video.close()
-        logger.info("🎞️ Video loaded: duration %.2f seconds", video_duration)
-        
-        # Validate clip times don't exceed video duration
-        for i, clip in enumerate(clips_data):
-            if clip["end"] > video_duration:
-                video.close()
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Clip {i} end time ({clip['end']}s) exceeds video duration ({video_duration:.2f}s)"
-                )
-        
-        # Generate output filenames
-        base_filename = Path(file.filename).stem if file.filename else "video"
-        total_clips = len(clips_data)
-        zip_filename = f"{base_filename}_clips.zip"
-        temp_zip_path = TEMP_DIR / zip_filename
-        
-        # Create clips and add to zip
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for i, clip in enumerate(clips_data):
-                start_time = clip["start"]
-                end_time = clip["end"]
-                
-                logger.info(
-                    "✂️ Creating clip %s: start=%.2fs end=%.2fs",
-                    i + 1,
-                    start_time,
-                    end_time
-                )
-                
-                # Generate clip filename
-                clip_suffix = "" if total_clips == 1 else f"_{i+1}"
-                clip_filename = f"{base_filename}_clip{clip_suffix}.mp4"
-                clip_path = TEMP_DIR / clip_filename
-                
-                # Extract clip using ffmpeg for reliability
-                try:
-                    ffmpeg_extract_subclip(
-                        temp_video_path,
-                        start_time,
-                        end_time,
-                        targetname=str(clip_path)
-                    )
-                except Exception as clip_error:
-                    logger.exception(
-                        "❌ Failed to create clip %s (start=%.2fs, end=%.2fs)",
-                        i + 1,
-                        start_time,
-                        end_time
-                    )
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Failed to create clip {i + 1}: {clip_error}"
-                    ) from clip_error
-                
-                if not clip_path.exists():
-                    logger.error(
-                        "❌ Clip file not created for clip %s (start=%.2fs, end=%.2fs)",
-                        i + 1,
-                        start_time,
-                        end_time
-                    )
+        temp_video_path, _ = await save_upload_stream(request.stream(), video_ext, content_hash, work_dir)
+        asset = asset_store.put(temp_video_path, content_hash, filename, video_ext)
+    finally:
+        remove_work_dir(work_dir)
+    logger.info("📦 Stored blob %s (%s bytes)", asset.id, asset.size)
+    return asset.to_dict()
+
+
+@app.post("/uploads", status_code=201)
+async def create_upload(
+    response: Response,
+    length: int = Form(...),
+    filename: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None)
+):
+    """
+    Start a resumable upload of length bytes.
+    
+    The whole file is preallocated up front and counted against temp storage,
+    so an upload that cannot fit on disk fails now rather than at 95%. Send
+    the content with PATCH, resume from the offset reported by HEAD after a
+    dropped connection, then finalize it into an asset.
+    """
+    if length <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Upload length must be positive"
+        )
+    if length > asset_store.max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Video exceeds the asset storage limit of {asset_store.max_bytes} bytes"
+        )
+    upload = Upload(length, filename, parse_sha256(sha256) if sha256 else None)
+    temp_storage.check(length)
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(upload.path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        preallocate_file(fd, length)
+    except OSError as e:
+        os.close(fd)
+        cleanup_files([str(upload.path)])
+        raise HTTPException(
+            status_code=507,
+            detail=f"Could not reserve {length} bytes for the upload: {e}"
+        )
+    os.close(fd)
+    
+    temp_storage.track(upload.path, length)
+    uploads[upload.id] = upload
+    logger.info("📤 Started upload %s (%s bytes)", upload.id, length)
+    response.headers["Location"] = f"/uploads/{upload.id}"
+    return upload.to_dict()
+
+
+@app.patch("/uploads/{upload_id}", status_code=204)
+async def patch_upload(upload_id: str, request: Request):
+    """
+    Write the request body into an upload at the offset given by the Upload-Offset header.
+    
+    The offset must match the server's, as reported by HEAD. Every chunk
+    received is kept even if the connection drops mid-request.
+    """
+    upload = find_upload(upload_id)
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=400,
+            detail="Upload-Offset header must be an integer"
+        )
+    if upload.lock.locked():
+        raise HTTPException(
+            status_code=409,
+            detail=f"Another chunk is already being written to upload {upload_id}"
+        )
+    
+    async with upload.lock:
+        if offset != upload.offset:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload-Offset {offset} does not match the current offset {upload.offset}",
+                headers={"Upload-Offset": str(upload.offset)}
+            )
+        fd = os.open(upload.path, os.O_WRONLY)
+        try:
+            async for chunk in request.stream():
+                if upload.offset + len(chunk) > upload.length:
                     raise HTTPException(
-                        status_code=500,
-                        detail=f"Clip {i + 1} was not created successfully"
+                        status_code=400,
+                        detail=f"Chunk exceeds the upload length of {upload.length} bytes",
+                        headers={"Upload-Offset": str(upload.offset)}
                     )
-                
-                # Add to zip
-                zipf.write(clip_path, clip_filename)
-                clip_paths.append(clip_path)
-                logger.info(
-                    "✅ Clip %s created and added to ZIP (%s)",
-                    i + 1,
-                    clip_filename
-                )
-        
-        # Check if zip file was created
-        if not temp_zip_path.exists():
-            cleanup_files([temp_video_path] + clip_paths)
+                await run_in_threadpool(write_at, fd, chunk, upload.offset)
+                upload.digest.update(chunk)
+                upload.offset += len(chunk)
+                upload.updated_at = time.time()
+        finally:
+            os.close(fd)
+    return Response(status_code=204, headers={"Upload-Offset": str(upload.offset)})
+
+
+@app.head("/uploads/{upload_id}")
+async def head_upload(upload_id: str):
+    """Report how many bytes of an upload have been received"""
+    upload = find_upload(upload_id)
+    return Response(headers={
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.length),
+        "Cache-Control": "no-store"
+    })
+
+
+@app.post("/uploads/{upload_id}/finalize", status_code=201)
+async def finalize_upload(upload_id: str):
+    """Verify a complete upload and store it as an asset for /convert, /clip and /jobs"""
+    upload = find_upload(upload_id)
+    async with upload.lock:
+        if upload.offset != upload.length:
             raise HTTPException(
-                status_code=500,
-                detail="Failed to create clips zip file"
+                status_code=409,
+                detail=f"Upload is incomplete: {upload.offset} of {upload.length} bytes received",
+                headers={"Upload-Offset": str(upload.offset)}
+            )
+        uploads.pop(upload.id, None)
+        content_hash = upload.digest.hexdigest()
+        if upload.expected_sha256 and content_hash != upload.expected_sha256:
+            temp_storage.release(upload.path)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Upload does not match the declared SHA-256 (received {content_hash})"
             )
+        try:
+            asset = asset_store.put(str(upload.path), content_hash, upload.filename, upload.suffix)
+        finally:
+            # The file now belongs to the asset store, or was removed if it could not be stored
+            temp_storage.release(upload.path)
+    logger.info("📦 Stored upload %s as asset %s", upload.id, asset.id)
+    return asset.to_dict()
+
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str):
+    """Abort an upload and free its disk space"""
+    upload = find_upload(upload_id)
+    uploads.pop(upload.id, None)
+    temp_storage.release(upload.path)
+
+
+@app.post("/probe")
+async def probe_video(file: UploadFile = File(...)):
+    """Read a video's duration, streams and codecs without processing it"""
+    validate_video_upload(file)
+    video_ext = Path(file.filename).suffix if file.filename else ".mp4"
+    work_dir = make_work_dir("probe")
+    try:
+        temp_video_path, content_hash = await save_upload_file(file, video_ext, directory=work_dir)
+        media_info = await probe_media(temp_video_path, content_hash)
+    finally:
+        remove_work_dir(work_dir)
+    return {"sha256": content_hash, **media_info}
+
+
+@app.get("/probe")
+async def get_probe(sha256: str):
+    """
+    Return cached metadata for a video by the SHA-256 of its content.
+    
+    Lets clients validate clip ranges before uploading a video the server has seen.
+    """
+    media_info = probe_cache.get(sha256.lower())
+    if media_info is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No metadata cached for this content hash"
+        )
+    probe_cache.move_to_end(sha256.lower())
+    return {"sha256": sha256.lower(), **media_info}
+
+
+def validate_video_upload(file: UploadFile):
+    """Reject uploads that are not videos"""
+    if not file.content_type or not file.content_type.startswith("video/"):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file type. Please upload a video file."
+        )
+
+
+def validate_video_source(file: Optional[UploadFile], asset_id: Optional[str]):
+    """Require exactly one of a video upload or a stored asset ID"""
+    if (file is None) == (asset_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide either a video 'file' or an 'asset_id'"
+        )
+    if file is not None:
+        validate_video_upload(file)
+
+
+def parse_sha256(value: str):
+    """Normalize a hex SHA-256 digest or raise 400"""
+    if not re.fullmatch(r"[0-9a-fA-F]{64}", value or ""):
+        raise HTTPException(
+            status_code=400,
+            detail="SHA-256 must be 64 hexadecimal characters"
+        )
+    return value.lower()
+
+
+def resolve_audio_profile(name, audio_codec=None):
+    """
+    Return the output settings of an audio profile for a source audio codec.
+    
+    Passthrough profiles copy codecs they have a container for and otherwise
+    use their fallback profile, which is also assumed while the codec is unknown.
+    """
+    profile = AUDIO_PROFILES[name]
+    if "copy" not in profile:
+        return profile
+    return profile["copy"].get(audio_codec) or AUDIO_PROFILES[profile["fallback"]]
+
+
+def parse_profiles(profiles: Optional[str]):
+    """Parse a comma-separated list of audio profile names, defaulting to MP3"""
+    names = []
+    for name in (profiles or DEFAULT_AUDIO_PROFILE).split(","):
+        name = name.strip()
+        if name not in AUDIO_PROFILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown audio profile '{name}'. Available profiles: {', '.join(AUDIO_PROFILES)}"
+            )
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def parse_clips(clips: str):
+    """Parse and validate the JSON clip definitions of a clip request"""
+    try:
+        clips_data = json.loads(clips)
+        if not isinstance(clips_data, list):
+            raise ValueError("Clips must be a list")
         
-        # Schedule cleanup after response is sent
-        files_to_cleanup = [temp_video_path, str(temp_zip_path)] + [str(p) for p in clip_paths]
-        background_tasks.add_task(cleanup_files, files_to_cleanup)
+        # Validate clip format
+        for i, clip in enumerate(clips_data):
+            if not isinstance(clip, dict):
+                raise ValueError(f"Clip {i} must be a dictionary")
+            if "start" not in clip or "end" not in clip:
+                raise ValueError(f"Clip {i} must have 'start' and 'end' keys")
+            if not isinstance(clip["start"], (int, float)) or not isinstance(clip["end"], (int, float)):
+                raise ValueError(f"Clip {i} start and end must be numbers")
+            if clip["start"] < 0 or clip["end"] < 0:
+                raise ValueError(f"Clip {i} start and end must be non-negative")
+            if clip["end"] <= clip["start"]:
+                raise ValueError(f"Clip {i} end must be greater than start")
+            if not isinstance(clip.get("accurate", False), bool):
+                raise ValueError(f"Clip {i} accurate must be true or false")
         
-        # Return the zip file
-        return FileResponse(
-            path=str(temp_zip_path),
-            filename=zip_filename,
-            media_type="application/zip"
+        if len(clips_data) == 0:
+            raise ValueError("At least one clip must be specified")
+            
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid JSON format for clips: {str(e)}"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    return clips_data
+
+
+def find_upload(upload_id):
+    """Look up a resumable upload or raise 404"""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Upload {upload_id} not found"
         )
+    return upload
+
+
+def find_job(job_id):
+    """Look up a job or raise 404"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job {job_id} not found"
+        )
+    return job
+
+
+async def open_video_source(operation, work_dir, file: Optional[UploadFile], asset_id=None, expected_sha256=None):
+    """
+    Save an uploaded video into a work directory, or pin a stored asset.
     
+    Returns the source path, its content hash and its original filename. Pass
+    the same asset_id to close_video_source once the source is no longer needed.
+    """
+    if asset_id:
+        asset = asset_store.acquire(asset_id)
+        return str(asset.path), asset.id, asset.filename
+    
+    video_ext = Path(file.filename).suffix if file.filename else ".mp4"
+    try:
+        source_path, content_hash = await save_upload_file(file, video_ext, expected_sha256, work_dir)
     except HTTPException:
         raise
     except Exception as e:
-        # Cleanup on error
-        cleanup_files([temp_video_path, str(temp_zip_path) if temp_zip_path else None] + [str(p) for p in clip_paths])
         raise HTTPException(
             status_code=500,
-            detail=f"Error clipping video: {str(e)}"
+            detail=f"{JOB_ERROR_PREFIX[operation]}: {str(e)}"
+        )
+    return source_path, content_hash, file.filename
+
+
+def close_video_source(source_path, asset_id=None):
+    """Remove an uploaded source video, or unpin a stored asset"""
+    if asset_id:
+        asset_store.release(asset_id)
+    else:
+        cleanup_files([source_path])
+
+
+async def create_job(
+    operation,
+    file: Optional[UploadFile],
+    clips_data=None,
+    asset_id=None,
+    expected_sha256=None,
+    profiles=None
+):
+    """Save an uploaded video, or pin a stored asset, and queue a job for it"""
+    admission.check_jobs()
+    work_dir = make_work_dir(operation)
+    try:
+        source_path, content_hash, filename = await open_video_source(
+            operation,
+            work_dir,
+            file,
+            asset_id,
+            expected_sha256
+        )
+    except BaseException:
+        remove_work_dir(work_dir)
+        raise
+    # Other requests may have been queued while the upload was saved, so check
+    # again with no await before the job is queued
+    try:
+        admission.check_jobs()
+    except HTTPException:
+        close_video_source(source_path, asset_id and content_hash)
+        remove_work_dir(work_dir)
+        raise
+    job = Job(
+        operation,
+        work_dir,
+        source_path,
+        content_hash,
+        filename,
+        clips_data,
+        asset_id and content_hash,
+        profiles
+    )
+    jobs[job.id] = job
+    job_queue.put_nowait(job)
+    logger.info("📥 Queued %s job %s", operation, job.id)
+    return job
+
+
+async def job_worker():
+    """Run queued jobs one at a time until cancelled"""
+    while True:
+        job = await job_queue.get()
+        try:
+            if job.id in jobs:
+                await run_job(job)
+        finally:
+            job_queue.task_done()
+
+
+async def run_job(job):
+    """Wait for an active slot, then run a job and record its outcome"""
+    await admission.start()
+    if job.id not in jobs:
+        # Discarded while it waited for a slot
+        admission.finish()
+        return
+    job.status = "running"
+    job.started_at = time.time()
+    metrics_endpoint.set(job.endpoint)
+    stage_timings.set(job.timings)
+    logger.info("🏃 Running %s job %s", job.operation, job.id)
+    try:
+        if job.operation == "convert":
+            await run_convert_job(job)
+        else:
+            await run_clip_job(job)
+        job.status = "succeeded"
+    except HTTPException as e:
+        job.status = "failed"
+        job.status_code = e.status_code
+        job.error = e.detail
+    except asyncio.CancelledError:
+        job.status = "failed"
+        job.status_code = 503
+        job.error = "Job was cancelled"
+        raise
+    except Exception as e:
+        logger.exception("❌ %s job %s failed", job.operation, job.id)
+        job.status = "failed"
+        job.status_code = 500
+        job.error = f"{JOB_ERROR_PREFIX[job.operation]}: {str(e)}"
+    finally:
+        job.finished_at = time.time()
+        admission.finish(job.finished_at - job.started_at)
+        # The source is no longer needed once the outputs exist
+        release_job_source(job)
+        temp_storage.measure(job.work_dir)
+        job.extraction_started.set()
+        job.done.set()
+    logger.info(
+        "🏁 %s job %s %s in %.2fs",
+        job.operation,
+        job.id,
+        job.status,
+        job.finished_at - job.started_at
+    )
+
+
+async def run_convert_job(job):
+    """
+    Encode a job's source to each requested audio profile in one ffmpeg pass.
+    
+    Profiles already in the result cache are served from it, and only the
+    rest are produced. Passthrough profiles remux the source audio when its
+    codec allows it instead of encoding.
+    """
+    media_info = await probe_media(job.source_path, job.content_hash)
+    audio_stream = next((stream for stream in media_info["streams"] if stream["type"] == "audio"), None)
+    if audio_stream is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Video has no audio stream"
+        )
+    job.resolve_audio_profiles(audio_stream["codec"])
+    
+    cache_keys = {
+        name: ResultCache.make_key(job.content_hash, *settings["args"])
+        for name, settings in job.audio_settings.items()
+    }
+    outputs = []
+    for name in job.profiles:
+        path = job.work_dir / f"{name}{job.audio_settings[name]['suffix']}"
+        cached_path = result_cache.get(cache_keys[name], job.audio_settings[name]["suffix"])
+        if cached_path:
+            logger.info("🗄️ Cache hit for %s (%s)", job.result_filename, name)
+            # The job keeps its own link, so later evictions cannot take the result away
+            link_file(cached_path, path)
+            job.result_paths[name] = path
+        else:
+            outputs.append((name, path))
+    if not outputs:
+        return
+    
+    def report_progress(seconds):
+        if media_info["duration"]:
+            job.encode_progress = min(seconds / media_info["duration"], 1.0)
+    
+    # Decode the audio stream once (if at all) and produce every missing profile from it
+    await encode_audio(
+        job.source_path,
+        [(job.audio_settings[name]["args"], str(path)) for name, path in outputs],
+        on_progress=report_progress
+    )
+    
+    for name, path in outputs:
+        # Check if audio file was created
+        if not path.exists():
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to convert video to audio"
+            )
+        
+        # Keep the result for repeat uploads of the same video
+        result_cache.put(cache_keys[name], job.audio_settings[name]["suffix"], path)
+        job.result_paths[name] = path
+
+
+async def run_clip_job(job):
+    """Validate a job's clip ranges against its source and extract every clip"""
+    # Probe video metadata
+    media_info = await probe_media(job.source_path, job.content_hash)
+    video_duration = media_info["duration"]
+    if video_duration is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not determine video duration"
         )
+    logger.info("🎞️ Video probed: duration %.2f seconds", video_duration)
+    
+    # Validate clip times don't exceed video duration
+    for i, clip in enumerate(job.clips_data):
+        if clip["end"] > video_duration:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Clip {i} end time ({clip['end']}s) exceeds video duration ({video_duration:.2f}s)"
+            )
+    
+    # Generate clip filenames
+    total_clips = len(job.clips_data)
+    for i in range(total_clips):
+        clip_suffix = "" if total_clips == 1 else f"_{i+1}"
+        job.clip_filenames.append(f"{job.base_filename}_clip{clip_suffix}.mp4")
+    job.clip_paths = [job.work_dir / f"clip_{i + 1}.mp4" for i in range(total_clips)]
+    
+    # Frame-accurate clips are cut around the source's keyframes
+    keyframes = None
+    video_stream = next((stream for stream in media_info["streams"] if stream["type"] == "video"), None)
+    if any(clip.get("accurate") for clip in job.clips_data):
+        keyframes = await get_keyframes(job.source_path, job.content_hash)
+    
+    # Extract clips in batches spread across concurrent ffmpeg processes
+    job.clip_tasks = start_clip_extraction(
+        job.source_path,
+        job.clips_data,
+        job.clip_paths,
+        keyframes,
+        video_stream
+    )
+    job.extraction_started.set()
+    await wait_for_clips(job.clip_tasks)
+
+
+def release_job_source(job):
+    """Remove a job's uploaded source, or unpin its stored asset, exactly once"""
+    if job.source_path:
+        close_video_source(job.source_path, job.asset_id)
+    job.source_path = None
+
+
+async def discard_job(job):
+    """Forget a job, stopping any unfinished clip extraction and removing its work directory"""
+    jobs.pop(job.id, None)
+    await cancel_tasks(job.clip_tasks)
+    if job.status == "queued":
+        release_job_source(job)
+    remove_work_dir(job.work_dir)
+
+
+async def expire_jobs():
+    """Periodically discard finished jobs whose results are older than JOB_RESULT_TTL"""
+    while True:
+        await asyncio.sleep(60)
+        now = time.time()
+        for job in list(jobs.values()):
+            if job.finished_at and now - job.finished_at > JOB_RESULT_TTL:
+                logger.info("🧹 Expiring %s job %s", job.operation, job.id)
+                await discard_job(job)
+
+
+async def expire_assets():
+    """Periodically remove stored assets that have not been used within ASSET_TTL"""
+    while True:
+        await asyncio.sleep(60)
+        asset_store.expire()
+
+
+async def expire_uploads():
+    """Periodically abort resumable uploads that have received nothing within UPLOAD_TTL"""
+    while True:
+        await asyncio.sleep(60)
+        deadline = time.time() - UPLOAD_TTL
+        for upload in list(uploads.values()):
+            if upload.updated_at < deadline and not upload.lock.locked():
+                logger.info("🧹 Expiring upload %s", upload.id)
+                uploads.pop(upload.id, None)
+                temp_storage.release(upload.path)
+
+
+async def sweep_temp_storage():
+    """Periodically re-measure temp storage and remove files orphaned by crashed requests"""
+    while True:
+        await asyncio.sleep(TEMP_SWEEP_INTERVAL)
+        temp_storage.sweep(min_age=TEMP_SWEEP_INTERVAL)
+
+
+async def stream_conversion(
+    background_tasks: BackgroundTasks,
+    file,
+    asset_id=None,
+    expected_sha256=None,
+    profile=DEFAULT_AUDIO_PROFILE
+):
+    """
+    Convert a video to one audio profile and stream the audio as ffmpeg produces it.
+    
+    Nothing is written to disk and the job queue is bypassed; the encode still
+    counts against admission control and takes a transcode slot. Repeat
+    videos are served from the result cache. Errors before the first chunk
+    get a normal error response; a failure after that aborts the connection,
+    so the client sees a truncated transfer.
+    """
+    admission.check_jobs()
+    work_dir = make_work_dir("stream")
+    try:
+        source_path, content_hash, filename = await open_video_source(
+            "convert",
+            work_dir,
+            file,
+            asset_id,
+            expected_sha256
+        )
+    except BaseException:
+        remove_work_dir(work_dir)
+        raise
+    try:
+        # Check again now the upload is saved; start counts the stream as
+        # waiting before it can yield, so no other request slips in between
+        admission.check_jobs()
+        await admission.start()
+    except BaseException:
+        close_video_source(source_path, asset_id and content_hash)
+        remove_work_dir(work_dir)
+        raise
+    started_at = time.time()
+    
+    def close_source():
+        close_video_source(source_path, asset_id and content_hash)
+        remove_work_dir(work_dir)
+        admission.finish(time.time() - started_at)
+    
+    try:
+        media_info = await probe_media(source_path, content_hash)
+        audio_stream = next((stream for stream in media_info["streams"] if stream["type"] == "audio"), None)
+        if audio_stream is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Video has no audio stream"
+            )
+        settings = resolve_audio_profile(profile, audio_stream["codec"])
+        result_filename = f"{Path(filename).stem if filename else 'output'}{settings['suffix']}"
+        
+        cached_path = result_cache.get(ResultCache.make_key(content_hash, *settings["args"]), settings["suffix"])
+        if cached_path:
+            logger.info("🗄️ Cache hit for %s", result_filename)
+            # Serve a private link, removed with the work directory after the response
+            result_path = work_dir / f"{profile}{settings['suffix']}"
+            link_file(cached_path, result_path)
+            background_tasks.add_task(close_source)
+            return FileResponse(path=str(result_path), filename=result_filename, media_type=settings["media_type"])
+        
+        # Wait for the first chunk so a failure to start still gets a proper status
+        chunks = stream_audio(source_path, settings)
+        try:
+            first_chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except FFmpegError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"{JOB_ERROR_PREFIX['convert']}: {str(e)}"
+            )
+    except BaseException:
+        close_source()
+        raise
+    
+    finished = asyncio.Event()
+    
+    async def finish():
+        # Runs from the body and again as a background task, which Starlette
+        # also runs when the client disconnects before the body finishes
+        if not finished.is_set():
+            finished.set()
+            await chunks.aclose()
+            close_source()
+    
+    async def body():
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+            logger.info("✅ Streamed %s", result_filename)
+        except Exception:
+            logger.exception("❌ Aborting audio stream of %s", result_filename)
+            raise
+        finally:
+            await finish()
+    
+    background_tasks.add_task(finish)
+    return StreamingResponse(
+        body(),
+        media_type=settings["media_type"],
+        headers={"Content-Disposition": content_disposition(result_filename)}
+    )
+
+
+def audio_output_filename(job, profile):
+    """Name a convert job's output for one profile, as it appears in a bundle"""
+    if len(job.profiles) == 1:
+        return job.result_filename
+    return f"{job.audio_filename}_{profile}{job.audio_settings[profile]['suffix']}"
+
+
+def audio_result_response(job):
+    """Serve a convert job's audio file, or a ZIP bundle when it has several profiles"""
+    missing = [
+        name for name in job.profiles
+        if name not in job.result_paths or not Path(job.result_paths[name]).exists()
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=410,
+            detail="Job result is no longer available"
+        )
+    if len(job.profiles) == 1:
+        return FileResponse(
+            path=str(job.result_paths[job.profiles[0]]),
+            filename=job.result_filename,
+            media_type=job.audio_settings[job.profiles[0]]["media_type"]
+        )
+    return StreamingResponse(
+        stream_zip(audio_zip_entries(job)),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(job.result_filename)}
+    )
+
+
+async def audio_zip_entries(job):
+    """Yield each profile's output of a convert job, followed by a JSON manifest"""
+    manifest = []
+    for name in job.profiles:
+        path = Path(job.result_paths[name])
+        yield audio_output_filename(job, name), path
+        manifest.append({
+            "file": audio_output_filename(job, name),
+            "profile": name,
+            "size": path.stat().st_size
+        })
+    yield "manifest.json", json.dumps({"outputs": manifest}, indent=2).encode()
+
+
+def format_timestamp(timestamp):
+    """Format a Unix timestamp as ISO 8601 UTC, passing None through"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg process exits with a non-zero status"""
+
+
+async def probe_ffmpeg():
+    """
+    Check once, in the background, that ffmpeg runs and has every encoder the API uses.
+    
+    The result is cached in ffmpeg_capabilities and reported by /health.
+    Missing encoders are only logged, since just the requests that need them fail.
+    """
+    try:
+        version = await read_tool_output([FFMPEG_BINARY, "-hide_banner", "-version"])
+        encoders_output = await read_tool_output([FFMPEG_BINARY, "-hide_banner", "-encoders"])
+    except FileNotFoundError:
+        ffmpeg_capabilities.update(status="missing")
+        logger.error("❌ FFmpeg not found in PATH - video processing will fail!")
+        return
+    except (FFmpegError, asyncio.TimeoutError) as e:
+        ffmpeg_capabilities.update(status="error")
+        logger.error(f"❌ FFmpeg check failed: {e!r}")
+        return
+    
+    # Encoder lines follow a " ------" separator, e.g. " A....D libmp3lame  libmp3lame MP3"
+    lines = encoders_output.splitlines()
+    separator = next((i for i, line in enumerate(lines) if line.strip().startswith("---")), len(lines))
+    available = {line.split()[1] for line in lines[separator + 1:] if len(line.split()) > 1}
+    missing = sorted(required_encoders() - available)
+    version_line = version.split("\n")[0]
+    ffmpeg_capabilities.update(status="ok", version=version_line, missing_encoders=missing)
+    logger.info(f"✅ FFmpeg is installed: {version_line}")
+    if missing:
+        logger.warning(f"⚠️ FFmpeg lacks encoders used by the API: {', '.join(missing)}")
+
+
+def required_encoders():
+    """Encoders named by the audio profiles and used for accurate clips"""
+    encoders = {"aac", *SMART_RENDER_ENCODERS.values()}
+    for profile in AUDIO_PROFILES.values():
+        for settings in [profile, *profile.get("copy", {}).values()]:
+            args = settings.get("args", [])
+            if "-c:a" in args:
+                encoders.add(args[args.index("-c:a") + 1])
+    encoders.discard("copy")
+    return encoders
+
+
+async def read_tool_output(cmd, timeout=10):
+    """Run a short command outside the transcode slots and return its stdout as text"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise media_tool_error(cmd, process.returncode, stderr)
+    return stdout.decode(errors="replace")
+
+
+def media_tool_error(cmd, returncode, stderr):
+    """Build the FFmpegError for a failed ffmpeg or ffprobe process from its stderr"""
+    lines = stderr.decode(errors="replace").strip().splitlines()
+    tool = Path(cmd[0]).name
+    return FFmpegError(" ".join(lines[-3:]) or f"{tool} exited with code {returncode}")
+
+
+async def run_media_tool(cmd, on_progress=None):
+    """
+    Run an ffmpeg or ffprobe command in a transcode slot without blocking the event loop.
+    
+    Returns the command's stdout. With on_progress, stdout is instead read as
+    ffmpeg's -progress stream and each reported output time (in seconds) is
+    passed to the callback.
+    """
+    async with transcode_slots:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            if on_progress is None:
+                stdout, stderr = await process.communicate()
+            else:
+                stdout = b""
+                stderr_task = asyncio.create_task(process.stderr.read())
+                try:
+                    async for line in process.stdout:
+                        key, _, value = line.decode(errors="replace").strip().partition("=")
+                        if key == "out_time_us" and value.isdigit():
+                            on_progress(int(value) / 1_000_000)
+                    stderr = await stderr_task
+                finally:
+                    stderr_task.cancel()
+                await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+    if process.returncode != 0:
+        raise media_tool_error(cmd, process.returncode, stderr)
+    return stdout
+
+
+async def stream_media_tool(cmd):
+    """
+    Run an ffmpeg command in a transcode slot and yield its stdout as it is produced.
+    
+    Raises FFmpegError once the output ends if the process failed. Closing the
+    generator early kills the process.
+    """
+    async with transcode_slots:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = asyncio.create_task(process.stderr.read())
+        try:
+            while True:
+                chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            stderr = await stderr_task
+            await process.wait()
+        finally:
+            stderr_task.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+    if process.returncode != 0:
+        raise media_tool_error(cmd, process.returncode, stderr)
+
+
+def ffmpeg_command(args, progress=False):
+    """Build an ffmpeg command line, reading -progress from stdout if requested"""
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-loglevel", "error", "-y"]
+    if progress:
+        cmd += ["-progress", "pipe:1", "-nostats"]
+    return cmd + [str(arg) for arg in args]
+
+
+async def run_ffmpeg(args, on_progress=None):
+    """Run ffmpeg with the given arguments, optionally reporting progress"""
+    await run_media_tool(ffmpeg_command(args, on_progress is not None), on_progress)
+
+
+async def probe_media(video_path, content_hash=None):
+    """
+    Read a video's duration, streams and codecs with a single ffprobe call.
+    
+    Results are cached by content hash, so repeat uploads are never probed twice.
+    """
+    if content_hash and content_hash in probe_cache:
+        probe_cache.move_to_end(content_hash)
+        return probe_cache[content_hash]
+    
+    try:
+        with observe_stage("probe"):
+            stdout = await run_media_tool([
+                FFPROBE_BINARY,
+                "-v", "error",
+                "-print_format", "json",
+                "-show_format",
+                "-show_streams",
+                str(video_path)
+            ])
+    except FFmpegError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Could not read video metadata: {e}"
+        ) from e
+    media_info = summarize_probe(json.loads(stdout))
+    
+    if content_hash:
+        probe_cache[content_hash] = media_info
+        while len(probe_cache) > PROBE_CACHE_SIZE:
+            probe_cache.popitem(last=False)
+    return media_info
+
+
+def summarize_probe(probe):
+    """Reduce raw ffprobe JSON to the fields the API uses"""
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    
+    streams = []
+    for stream in probe.get("streams", []):
+        streams.append({
+            "index": stream.get("index"),
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name"),
+            "duration": to_float(stream.get("duration")),
+            "bit_rate": to_float(stream.get("bit_rate")),
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "frame_rate": stream.get("avg_frame_rate"),
+            "pix_fmt": stream.get("pix_fmt"),
+            "sample_rate": to_float(stream.get("sample_rate")),
+            "channels": stream.get("channels")
+        })
+    
+    format_info = probe.get("format", {})
+    duration = to_float(format_info.get("duration"))
+    if duration is None:
+        stream_durations = [stream["duration"] for stream in streams if stream["duration"]]
+        duration = max(stream_durations) if stream_durations else None
+    return {
+        "duration": duration,
+        "format": format_info.get("format_name"),
+        "size": format_info.get("size") and int(format_info["size"]),
+        "bit_rate": to_float(format_info.get("bit_rate")),
+        "streams": streams
+    }
+
+
+async def encode_audio(video_path, outputs, on_progress=None):
+    """
+    Encode the first audio stream of a video to several outputs with one ffmpeg process.
+    
+    outputs is a list of (encoder args, path) pairs. The stream is demuxed and
+    decoded once and every encoder is fed from that decode; no video is decoded.
+    """
+    args = ["-i", video_path]
+    for encoder_args, audio_path in outputs:
+        args += ["-map", "0:a:0", *encoder_args, audio_path]
+    with observe_stage("encode"):
+        await run_ffmpeg(args, on_progress)
+
+
+async def stream_audio(video_path, settings):
+    """Produce the first audio stream of a video with a profile's settings, yielding the output as it is written"""
+    chunks = stream_media_tool(ffmpeg_command([
+        "-i", video_path,
+        "-map", "0:a:0",
+        *settings["args"],
+        *settings.get("stream_args", []),
+        "-f", settings["format"],
+        "pipe:1"
+    ]))
+    try:
+        with observe_stage("encode"):
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def extract_subclips(video_path, time_ranges, clip_paths):
+    """
+    Stream-copy several (start, end) ranges of a video with a single ffmpeg process.
+    
+    Each range is opened as its own input with an input-side seek, so every clip
+    starts from the keyframe before its start time exactly as a standalone
+    extraction would, and only the requested ranges are demuxed.
+    """
+    args = []
+    for start_time, end_time in time_ranges:
+        args += [
+            "-ss", f"{start_time:.2f}",
+            "-t", f"{end_time - start_time:.2f}",
+            "-i", video_path
+        ]
+    for index, clip_path in enumerate(clip_paths):
+        args += ["-map", str(index), "-c", "copy", clip_path]
+    await run_ffmpeg(args)
+
+
+def start_clip_extraction(video_path, clips_data, clip_paths, keyframes=None, video_stream=None):
+    """
+    Start extracting every requested clip using up to CLIP_CONCURRENCY ffmpeg processes.
+    
+    Stream-copied clips are split into batches, each written by one process.
+    Clips marked "accurate" are smart-rendered one at a time from the source's
+    keyframe index. Returns one task per clip (shared by the clips of a batch)
+    that finishes once that clip's file has been written.
+    """
+    fast_clips = [i for i, clip in enumerate(clips_data) if not clip.get("accurate")]
+    accurate_clips = [i for i, clip in enumerate(clips_data) if clip.get("accurate")]
+    workers = asyncio.Semaphore(CLIP_CONCURRENCY)
+    
+    async def run_clip_work(indexes, extract):
+        async with workers:
+            label = clip_range_label(indexes)
+            logger.info("✂️ Creating %s", label)
+            try:
+                # A batch's time is split evenly across its clips
+                with observe_stage("clip", count=len(indexes)):
+                    await extract()
+            except asyncio.CancelledError:
+                raise
+            except Exception as clip_error:
+                logger.exception("❌ Failed to create %s", label)
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to create {label}: {clip_error}"
+                ) from clip_error
+    
+    clip_tasks = [None] * len(clip_paths)
+    if fast_clips:
+        batch_size = min(CLIP_BATCH_SIZE, math.ceil(len(fast_clips) / CLIP_CONCURRENCY))
+        for batch_start in range(0, len(fast_clips), batch_size):
+            batch = fast_clips[batch_start:batch_start + batch_size]
+            extract = functools.partial(
+                extract_subclips,
+                video_path,
+                [(clips_data[i]["start"], clips_data[i]["end"]) for i in batch],
+                [str(clip_paths[i]) for i in batch]
+            )
+            task = asyncio.create_task(run_clip_work(batch, extract))
+            for i in batch:
+                clip_tasks[i] = task
+    for i in accurate_clips:
+        extract = functools.partial(
+            render_accurate_clip,
+            video_path,
+            clips_data[i]["start"],
+            clips_data[i]["end"],
+            clip_paths[i],
+            keyframes or [],
+            video_stream
+        )
+        clip_tasks[i] = asyncio.create_task(run_clip_work([i], extract))
+    return clip_tasks
+
+
+async def wait_for_clips(clip_tasks):
+    """Wait for every clip batch, cancelling the rest as soon as one fails"""
+    tasks = set(clip_tasks)
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    await cancel_tasks(pending)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    if any(task.cancelled() for task in tasks):
+        raise RuntimeError("Clip extraction was cancelled")
+
+
+async def cancel_tasks(tasks):
+    """Cancel tasks and wait for them, and any ffmpeg processes they own, to finish"""
+    tasks = set(tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ZipStreamBuffer:
+    """Write-only file object that collects what zipfile writes so it can be streamed out"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def copy_zip_chunk(source, dest):
+    """Move one chunk from a clip file into an open ZIP entry, returning False at EOF"""
+    chunk = source.read(ZIP_CHUNK_SIZE)
+    if not chunk:
+        return False
+    dest.write(chunk)
+    return True
+
+
+def zip_compress_type(arcname):
+    """Store already-compressed media as-is and only DEFLATE small text entries"""
+    if Path(arcname).suffix.lower() in STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+async def stream_zip(entries, compress_type=zip_compress_type):
+    """
+    Yield a ZIP archive built from an async iterable of (arcname, source) pairs.
+    
+    A source is either a file path, copied in a single pass that also computes
+    the CRC32, or bytes for small generated entries. The archive is written
+    straight to the response: entries use data descriptors, and ZIP64 is used
+    whenever sizes or offsets need it.
+    """
+    buffer = ZipStreamBuffer()
+    # Only time spent writing entries counts as assembly, not waiting for
+    # entries to become ready or for the client to take the output
+    assembly_seconds = 0.0
+    outcome = "error"
+    try:
+        with zipfile.ZipFile(buffer, 'w') as zipf:
+            async for arcname, source in entries:
+                started = time.perf_counter()
+                if isinstance(source, bytes):
+                    zinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+                    zinfo.compress_type = compress_type(arcname)
+                    zipf.writestr(zinfo, source)
+                else:
+                    zinfo = zipfile.ZipInfo.from_file(source, arcname)
+                    zinfo.compress_type = compress_type(arcname)
+                    with open(source, "rb") as source_file, zipf.open(zinfo, 'w') as dest:
+                        while await run_in_threadpool(copy_zip_chunk, source_file, dest):
+                            data = buffer.drain()
+                            if data:
+                                assembly_seconds += time.perf_counter() - started
+                                yield data
+                                started = time.perf_counter()
+                assembly_seconds += time.perf_counter() - started
+                yield buffer.drain()
+        yield buffer.drain()
+        outcome = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        record_stage("zip", outcome, assembly_seconds)
+
+
+async def clip_zip_entries(clip_tasks, clips_data, clip_paths, clip_filenames):
+    """Yield each clip in request order once it is ready, followed by a JSON manifest"""
+    manifest = []
+    for i, clip_path in enumerate(clip_paths):
+        await asyncio.wait([clip_tasks[i]])
+        if clip_tasks[i].cancelled():
+            raise RuntimeError(f"Clip {i + 1} was cancelled")
+        clip_tasks[i].result()
+        if not clip_path.exists():
+            raise RuntimeError(f"Clip {i + 1} was not created successfully")
+        yield clip_filenames[i], clip_path
+        logger.info("✅ Clip %s added to ZIP stream (%s)", i + 1, clip_filenames[i])
+        manifest.append({
+            "file": clip_filenames[i],
+            "start": clips_data[i]["start"],
+            "end": clips_data[i]["end"],
+            "accurate": clips_data[i].get("accurate", False),
+            "size": clip_path.stat().st_size
+        })
+    yield "manifest.json", json.dumps({"clips": manifest}, indent=2).encode()
+
+
+async def stream_job_zip(job, discard=False):
+    """
+    Stream a clip job's ZIP, sending each clip as soon as it is ready.
+    
+    A failure after streaming has started aborts the response. With discard,
+    the job is dropped afterwards, cancelling unfinished clip batches and
+    removing its files.
+    """
+    entries = clip_zip_entries(job.clip_tasks, job.clips_data, job.clip_paths, job.clip_filenames)
+    try:
+        async for data in stream_zip(entries):
+            yield data
+    except Exception:
+        logger.exception("❌ Aborting clips ZIP stream for job %s", job.id)
+        raise
+    finally:
+        if discard:
+            await discard_job(job)
+
+
+def record_stage(stage, outcome, seconds, count=1):
+    """
+    Record time spent in a processing stage.
+    
+    The stage histogram gets count equal observations that add up to seconds,
+    and the current request's or job's breakdown gets the whole duration.
+    """
+    histogram = STAGE_SECONDS.labels(stage, metrics_endpoint.get(), outcome)
+    for _ in range(count):
+        histogram.observe(seconds / count)
+    timings = stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def server_timing(timings, total):
+    """Format a stage breakdown in seconds as a Server-Timing header value"""
+    metrics = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    return ", ".join(metrics + [f"total;dur={total * 1000:.1f}"])
+
+
+@contextmanager
+def observe_stage(stage, count=1):
+    """Time the enclosed block as a processing stage (see record_stage)"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        record_stage(stage, outcome, time.perf_counter() - started, count)
+
+
+def content_disposition(filename):
+    """Build an attachment Content-Disposition header the same way FileResponse does"""
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
+
+
+async def get_keyframes(video_path, content_hash=None):
+    """
+    Build the keyframe index of a video's first video stream.
+    
+    Returns (pts, dts) pairs in seconds, sorted by presentation time. Only
+    packet headers are read, nothing is decoded, and the index is cached by
+    content hash.
+    """
+    if content_hash and content_hash in keyframe_cache:
+        keyframe_cache.move_to_end(content_hash)
+        return keyframe_cache[content_hash]
+    
+    stdout = await run_media_tool([
+        FFPROBE_BINARY,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,flags",
+        "-of", "compact=p=0",
+        str(video_path)
+    ])
+    keyframes = []
+    for line in stdout.decode(errors="replace").splitlines():
+        fields = dict(field.partition("=")[::2] for field in line.split("|"))
+        if "K" not in fields.get("flags", "") or fields.get("pts_time", "N/A") == "N/A":
+            continue
+        pts = float(fields["pts_time"])
+        dts = float(fields["dts_time"]) if fields.get("dts_time", "N/A") != "N/A" else pts
+        keyframes.append((pts, dts))
+    keyframes.sort()
+    
+    if content_hash:
+        keyframe_cache[content_hash] = keyframes
+        while len(keyframe_cache) > PROBE_CACHE_SIZE:
+            keyframe_cache.popitem(last=False)
+    return keyframes
+
+
+async def render_accurate_clip(video_path, start_time, end_time, clip_path, keyframes, video_stream):
+    """
+    Cut a frame-accurate clip while re-encoding as little as possible ("smart render").
+    
+    Only the partial GOPs before the first and after the last keyframe inside
+    the clip are re-encoded; the GOPs in between are stream-copied. Every part
+    carries its parameter sets in-band so the concat demuxer can join parts
+    with different encoder settings, and the result is muxed with the clip's
+    audio, which is re-encoded to start exactly on the cut. Sources in codecs
+    we cannot re-encode to match, or clips with no keyframe inside them, are
+    fully re-encoded instead.
+    """
+    # Half a millisecond: well below any frame interval, above timestamp rounding
+    epsilon = 0.0005
+    encoder = SMART_RENDER_ENCODERS.get(video_stream["codec"]) if video_stream else None
+    inner_keyframes = [
+        (pts, dts) for pts, dts in keyframes
+        if start_time - epsilon <= pts <= end_time + epsilon
+    ]
+    if encoder is None or len(inner_keyframes) < 2:
+        await reencode_clip(video_path, start_time, end_time, clip_path)
+        return
+    
+    (first_key, _), (last_key, last_key_dts) = inner_keyframes[0], inner_keyframes[-1]
+    annexb_filter = f"{video_stream['codec']}_mp4toannexb"
+    encode_args = [
+        "-map", "0:v:0",
+        "-c:v", encoder,
+        "-preset", SMART_RENDER_PRESET,
+        "-crf", SMART_RENDER_CRF,
+        "-pix_fmt", video_stream.get("pix_fmt") or "yuv420p",
+        "-bsf:v", annexb_filter
+    ]
+    parts_dir = Path(tempfile.mkdtemp(dir=Path(clip_path).parent))
+    try:
+        parts = []
+        if first_key - start_time > epsilon:
+            parts.append(parts_dir / "head.mkv")
+            await run_ffmpeg([
+                "-ss", f"{start_time:.6f}",
+                "-i", video_path,
+                "-t", f"{first_key - start_time:.6f}",
+                *encode_args,
+                parts[-1]
+            ])
+        
+        # Seek just past the first keyframe so the demuxer lands on it, and stop
+        # before the last keyframe's decode time so it is left to the tail
+        copy_start = first_key + epsilon
+        parts.append(parts_dir / "middle.mkv")
+        await run_ffmpeg([
+            "-ss", f"{copy_start:.6f}",
+            "-i", video_path,
+            "-t", f"{last_key_dts - copy_start - epsilon:.6f}",
+            "-map", "0:v:0",
+            "-c:v", "copy",
+            "-bsf:v", annexb_filter,
+            parts[-1]
+        ])
+        
+        if end_time - last_key > epsilon:
+            parts.append(parts_dir / "tail.mkv")
+            await run_ffmpeg([
+                "-ss", f"{last_key:.6f}",
+                "-i", video_path,
+                "-t", f"{end_time - last_key:.6f}",
+                *encode_args,
+                parts[-1]
+            ])
+        
+        concat_list = parts_dir / "parts.txt"
+        concat_list.write_text("".join(f"file '{part.name}'\n" for part in parts))
+        await run_ffmpeg([
+            "-f", "concat",
+            "-safe", "0",
+            "-i", concat_list,
+            "-ss", f"{start_time:.6f}",
+            "-t", f"{end_time - start_time:.6f}",
+            "-i", video_path,
+            "-map", "0:v",
+            "-map", "1:a:0?",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-b:a", "192k",
+            clip_path
+        ])
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+async def reencode_clip(video_path, start_time, end_time, clip_path):
+    """Cut a frame-accurate clip by re-encoding all of it"""
+    await run_ffmpeg([
+        "-ss", f"{start_time:.6f}",
+        "-i", video_path,
+        "-t", f"{end_time - start_time:.6f}",
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-c:v", "libx264",
+        "-preset", SMART_RENDER_PRESET,
+        "-crf", SMART_RENDER_CRF,
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-b:a", "192k",
+        clip_path
+    ])
+
+
+def clip_range_label(indexes):
+    """Describe a batch of zero-based clip indexes for logs and errors"""
+    numbers = [i + 1 for i in indexes]
+    if len(numbers) == 1:
+        return f"clip {numbers[0]}"
+    if numbers == list(range(numbers[0], numbers[-1] + 1)):
+        return f"clips {numbers[0]}-{numbers[-1]}"
+    return "clips " + ", ".join(str(number) for number in numbers)
+
+
+async def save_upload_file(file: UploadFile, suffix: str, expected_sha256=None, directory=WORK_DIR):
+    """Stream an uploaded file to disk chunk by chunk (see save_upload_stream)"""
+    async def read_chunks():
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    
+    return await save_upload_stream(read_chunks(), suffix, expected_sha256, directory)
+
+
+async def save_upload_stream(chunks, suffix: str, expected_sha256=None, directory=WORK_DIR):
+    """
+    Write an async iterable of byte chunks into a new file in directory.
+    
+    Returns the saved path and the SHA-256 of the content, computed as it arrives.
+    With expected_sha256, content that does not match is removed and rejected with 400.
+    """
+    if expected_sha256 is not None:
+        expected_sha256 = parse_sha256(expected_sha256)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(
+        delete=False,
+        suffix=suffix,
+        dir=directory
+    ) as temp_file, observe_stage("save"):
+        try:
+            async for chunk in chunks:
+                temp_storage.charge(directory, len(chunk))
+                digest.update(chunk)
+                # Writes can block under write-back pressure, so keep them off the event loop
+                await run_in_threadpool(temp_file.write, chunk)
+            content_hash = digest.hexdigest()
+            if expected_sha256 and content_hash != expected_sha256:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Upload does not match the declared SHA-256 (received {content_hash})"
+                )
+        except BaseException:
+            temp_file.close()
+            cleanup_files([temp_file.name])
+            raise
+        return temp_file.name, content_hash
+
+
+def preallocate_file(fd, length):
+    """Reserve length bytes of disk for a file, so writes into it cannot run out of space"""
+    if hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fd, 0, length)
+    else:
+        os.ftruncate(fd, length)
+
+
+def write_at(fd, data, offset):
+    """Write all of data at offset with positional writes, leaving the file position alone"""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def make_work_dir(prefix):
+    """Create a uniquely named scratch directory for one request or job, refusing with 507 when disk is short"""
+    temp_storage.check()
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix=f"{prefix}-", dir=WORK_DIR))
+    temp_storage.track(work_dir)
+    return work_dir
+
+
+def remove_work_dir(work_dir):
+    """Remove a scratch directory and everything in it"""
+    temp_storage.release(work_dir)
+
+
+def disk_size(path):
+    """Bytes held by a file, or by every file under a directory"""
+    try:
+        if not os.path.isdir(path):
+            return os.lstat(path).st_size
+    except FileNotFoundError:
+        return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def link_file(source_path, destination_path):
+    """Hard-link a file to a new path, copying it when the filesystem cannot link"""
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copyfile(source_path, destination_path)
 
 
 def cleanup_files(file_paths):
-    """Remove temporary files"""
+    """Remove temporary files, logging any that could not be removed"""
     for file_path in file_paths:
         if file_path and os.path.exists(file_path):
             try:
@@ -347,11 +2855,13 @@ def cleanup_files(file_paths):
                     shutil.rmtree(file_path)
                 else:
                     os.remove(file_path)
-            except Exception:
-                pass
+            except Exception as e:
+                logger.warning(f"⚠️ Could not remove {file_path}: {e}")
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
 